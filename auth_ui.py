@@ -3,17 +3,21 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import database_manager as db_manager 
+import db_worker
 
 class AuthUI:
-    def __init__(self, root, app_callbacks):
+    def __init__(self, root, app_callbacks, db_executor=None):
         """
         Инициализирует UI для аутентификации.
         :param root: Корневое окно Tkinter.
         :param app_callbacks: Словарь с колбэками для вызова из основного приложения,
                               например, {'on_login_success': self.setup_main_application_ui}
+        :param db_executor: db_worker.DbExecutor для запросов к БД в фоновом потоке
+                            (если не передан, создается собственный).
         """
         self.root = root
         self.app_callbacks = app_callbacks 
+        self.db_executor = db_executor or db_worker.DbExecutor(root)
 
         self.login_frame = None
         self.register_frame = None
@@ -102,17 +106,22 @@ class AuthUI:
             messagebox.showerror("Ошибка входа", "Логин и пароль не могут быть пустыми.", parent=self.root)
             return
 
-        if db_manager.check_user_credentials_db(username, password):
-            
-            if 'on_login_success' in self.app_callbacks:
-                self.app_callbacks['on_login_success'](username)
-            else:
+        def on_checked(credentials_ok):
+            if credentials_ok:
                 
-                messagebox.showinfo("Успешный вход", f"Добро пожаловать, {username}!", parent=self.root)
-                self.clear_auth_frames() 
-        else:
-            messagebox.showerror("Ошибка входа", "Неверный логин или пароль.", parent=self.root)
-            self.login_password_entry.delete(0, tk.END)
+                if 'on_login_success' in self.app_callbacks:
+                    self.app_callbacks['on_login_success'](username)
+                else:
+                    
+                    messagebox.showinfo("Успешный вход", f"Добро пожаловать, {username}!", parent=self.root)
+                    self.clear_auth_frames() 
+            else:
+                messagebox.showerror("Ошибка входа", "Неверный логин или пароль.", parent=self.root)
+                if self.login_frame and self.login_frame.winfo_exists():
+                    self.login_password_entry.delete(0, tk.END)
+
+        self.db_executor.submit(db_manager.check_user_credentials_db, username, password,
+                                key="auth.login", on_success=on_checked)
 
     def _handle_registration_attempt(self):
         """Обрабатывает попытку регистрации пользователя."""
@@ -133,12 +142,14 @@ class AuthUI:
             messagebox.showerror("Ошибка регистрации", "Пароли не совпадают.", parent=self.root)
             return
 
-        reg_result = db_manager.add_user_db(username, password)
-        if reg_result == True:
-            messagebox.showinfo("Успешная регистрация", "Пользователь успешно зарегистрирован. Теперь вы можете войти.", parent=self.root)
-            self.show_login_screen() 
-        elif reg_result == "integrity_error":
-            messagebox.showerror("Ошибка регистрации", "Пользователь с таким именем уже существует.", parent=self.root)
+        def on_registered(reg_result):
+            if reg_result == True:
+                messagebox.showinfo("Успешная регистрация", "Пользователь успешно зарегистрирован. Теперь вы можете войти.", parent=self.root)
+                self.show_login_screen() 
+            elif reg_result == "integrity_error":
+                messagebox.showerror("Ошибка регистрации", "Пользователь с таким именем уже существует.", parent=self.root)
+
+        self.db_executor.submit(db_manager.add_user_db, username, password, on_success=on_registered)
         
 
 if __name__ == '__main__':
@@ -0,0 +1,66 @@
+from tkinter import ttk
+
+
+class AutocompleteCombobox:
+    """
+    Поле выбора с подсказками при вводе на основе ttk.Combobox.
+    Вместо полного списка в Combobox загружаются только первые max_results подписей,
+    совпавших по префиксу с введенным текстом (utils.IdLabelIndex.search). Поиск
+    выполняется с задержкой delay_ms после последнего нажатия клавиши, так что
+    быстрый ввод не пересчитывает подсказки на каждый символ.
+    Выбранное значение - подпись из индекса; selected_id() возвращает ее ID.
+    """
+    MAX_RESULTS = 50
+    DEBOUNCE_MS = 150
+
+    def __init__(self, parent, index, textvariable, max_results=MAX_RESULTS, delay_ms=DEBOUNCE_MS, **options):
+        """
+        :param index: utils.IdLabelIndex, по которому ищутся подсказки.
+        :param textvariable: tk.StringVar с текстом поля.
+        """
+        self.index = index
+        self.textvariable = textvariable
+        self.max_results = max_results
+        self.delay_ms = delay_ms
+        self._after_id = None
+
+        self.combo = ttk.Combobox(parent, textvariable=textvariable, postcommand=self._update_values, **options)
+        self.combo.bind("<KeyRelease>", self._on_key_release)
+
+    def grid(self, **kwargs):
+        self.combo.grid(**kwargs)
+
+    def pack(self, **kwargs):
+        self.combo.pack(**kwargs)
+
+    def selected_id(self):
+        """ID выбранной записи или None, если текст не совпадает ни с одной подписью."""
+        return self.index.id_for(self.textvariable.get())
+
+    def set_id(self, entity_id):
+        """Показывает подпись записи entity_id (пусто, если ее нет в индексе)."""
+        self.textvariable.set(self.index.label_for(entity_id) or "")
+
+    def clear(self):
+        self._cancel_pending()
+        self.textvariable.set("")
+        self.combo['values'] = ()
+
+    def refresh(self):
+        """Пересчитывает подсказки после изменения индекса."""
+        self._update_values()
+
+    def _on_key_release(self, event):
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        self._cancel_pending()
+        self._after_id = self.combo.after(self.delay_ms, self._update_values)
+
+    def _cancel_pending(self):
+        if self._after_id is not None:
+            self.combo.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _update_values(self):
+        self._after_id = None
+        self.combo['values'] = self.index.search(self.textvariable.get(), self.max_results)
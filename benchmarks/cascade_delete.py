@@ -0,0 +1,73 @@
+"""
+Замер времени удаления курса (ON DELETE CASCADE по таблице favorites)
+с индексом со стороны курса и без него.
+
+Запуск из корня проекта:
+    python benchmarks/cascade_delete.py [--students 20000] [--courses 5000] [--per-student 50] [--deletes 20]
+
+По умолчанию создается 20 000 студентов по 50 курсов в избранном = 1 000 000 записей
+во временной БД; рабочий online_school.db не затрагивается.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database_manager as db_manager
+
+
+def fill_database(students, courses, per_student):
+    """Заполняет пустую БД студентами, курсами и случайными записями избранного."""
+    rng = random.Random(42)
+    with db_manager.db_connection() as conn:
+        conn.executemany("INSERT INTO students (student_id, name, email) VALUES (?, ?, ?)",
+                         ((i, f"Студент {i}", f"student{i}@example.com") for i in range(1, students + 1)))
+        conn.executemany("INSERT INTO courses (course_id, title) VALUES (?, ?)",
+                         ((i, f"Курс {i}") for i in range(1, courses + 1)))
+        conn.executemany("INSERT INTO favorites (student_id, course_id, is_favorite, likes) VALUES (?, ?, ?, ?)",
+                         ((s, c, rng.random() < 0.5, rng.randrange(50))
+                          for s in range(1, students + 1)
+                          for c in rng.sample(range(1, courses + 1), per_student)))
+        conn.commit()
+        conn.execute("ANALYZE")
+
+
+def time_deletes(course_ids):
+    """Удаляет курсы по одному через delete_course_db и возвращает среднее время, мс."""
+    started = time.perf_counter()
+    for course_id in course_ids:
+        db_manager.delete_course_db(course_id)
+    return (time.perf_counter() - started) * 1000 / len(course_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--courses", type=int, default=5000)
+    parser.add_argument("--per-student", type=int, default=50, help="курсов в избранном у каждого студента")
+    parser.add_argument("--deletes", type=int, default=20, help="сколько курсов удалить в каждом прогоне")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager.DB_NAME = os.path.join(tmp_dir, "bench.db")
+        db_manager.init_db()
+        print(f"Заполнение: {args.students} студентов x {args.per_student} курсов "
+              f"= {args.students * args.per_student} записей избранного...")
+        fill_database(args.students, args.courses, args.per_student)
+
+        with_index = time_deletes(range(1, args.deletes + 1))
+        print(f"С индексом idx_favorites_course_covering: {with_index:.2f} мс на курс")
+
+        with db_manager.db_connection() as conn:
+            conn.execute("DROP INDEX idx_favorites_course_covering")
+            conn.commit()
+        without_index = time_deletes(range(args.deletes + 1, 2 * args.deletes + 1))
+        print(f"Без индекса (полный просмотр favorites): {without_index:.2f} мс на курс")
+        db_manager.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Массовый импорт студентов и курсов из CSV или JSON Lines без графического интерфейса.
+
+Файл читается потоково, строки проверяются теми же правилами, что и в интерфейсе
+(utils.is_valid_email, utils.is_valid_youtube_link), и вставляются большими пачками
+через executemany - одна транзакция на пачку. Некорректные строки и дубликаты email
+не останавливают импорт, а записываются в файл отказов с номером строки и причиной.
+
+Разбор и проверку строк можно распараллелить (--workers N): куски файла по
+--chunk-size строк обрабатываются в пуле процессов, а единственный писатель -
+основной процесс - записывает проверенные пачки в БД в исходном порядке.
+
+Запуск:
+    python bulk_import.py students.csv --kind students
+    python bulk_import.py courses.jsonl --kind courses --batch-size 10000 --rejects bad.jsonl
+    python bulk_import.py students.csv --kind students --workers 4 --chunk-size 20000
+
+Поля студентов: name, email. Поля курсов: title, description, instructor_name
+(или instructor), level, youtube_link.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from collections import namedtuple, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import database_manager as db_manager
+from utils import is_valid_email, is_valid_youtube_link, COURSE_LEVELS
+
+BATCH_SIZE = 5000
+CHUNK_SIZE = 10000           # строк в одном задании для процесса проверки
+
+
+class ImportReport(namedtuple('ImportReport', 'total imported rejected seconds rejects_path')):
+    @property
+    def rows_per_second(self):
+        return self.total / self.seconds if self.seconds > 0 else 0.0
+
+
+def detect_format(path):
+    """Определяет формат по расширению: 'jsonl' для .jsonl/.ndjson/.json, иначе 'csv'."""
+    extension = os.path.splitext(path)[1].lower()
+    return 'jsonl' if extension in ('.jsonl', '.ndjson', '.json') else 'csv'
+
+
+def _raw_reader(f, file_format):
+    """
+    Возвращает (заголовок, итератор (номер строки, сырые данные)) для открытого файла.
+    Сырые данные - список полей CSV или строка JSON; для JSON Lines заголовок None.
+    """
+    if file_format == 'csv':
+        reader = csv.reader(f)
+        header = next(reader, [])
+        return header, ((reader.line_num, fields) for fields in reader if fields)
+    return None, ((line_number, line) for line_number, line in enumerate(f, start=1) if line.strip())
+
+
+def parse_record(header, raw):
+    """Сырые данные -> запись-словарь (как у csv.DictReader) или None, если строку не разобрать."""
+    if header is not None:
+        record = dict(zip(header, raw))
+        if len(raw) > len(header):
+            record[None] = raw[len(header):]
+        for name in header[len(raw):]:
+            record[name] = None
+        return record
+    try:
+        record = json.loads(raw)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def _field(record, *names):
+    """Значение первого найденного поля записи в виде строки без пробелов по краям."""
+    for name in names:
+        value = record.get(name)
+        if value is not None:
+            return str(value).strip()
+    return ""
+
+
+def validate_student(record):
+    """Возвращает ((name, email), None) для корректной записи или (None, причина)."""
+    if record is None:
+        return None, "строка не разобрана"
+    name = _field(record, 'name')
+    email = _field(record, 'email')
+    if not name or not email:
+        return None, "имя и email обязательны"
+    if not is_valid_email(email):
+        return None, "некорректный формат email"
+    return (name, email), None
+
+
+def validate_course(record):
+    """Возвращает ((title, description, instructor, level, youtube_link), None) или (None, причина)."""
+    if record is None:
+        return None, "строка не разобрана"
+    title = _field(record, 'title')
+    level = _field(record, 'level')
+    youtube_link = _field(record, 'youtube_link')
+    if not title:
+        return None, "название курса обязательно"
+    if level and level not in COURSE_LEVELS:
+        return None, f"неизвестный уровень '{level}'"
+    if not is_valid_youtube_link(youtube_link):
+        return None, "ссылка на YouTube должна содержать 'youtube.com/' или 'youtu.be/'"
+    row = (title, _field(record, 'description'), _field(record, 'instructor_name', 'instructor'),
+           level or None, youtube_link)
+    return row, None
+
+
+class RejectWriter:
+    """Файл отказов в формате входного файла: исходные поля плюс _line и _reason."""
+
+    def __init__(self, path, file_format):
+        self.path = path
+        self.file_format = file_format
+        self.count = 0
+        self._file = None
+        self._csv_writer = None
+
+    def write(self, line_number, record, reason):
+        if self._file is None:
+            self._file = open(self.path, 'w', newline='', encoding='utf-8')
+        row = {key: value for key, value in (record or {}).items() if key is not None}
+        row['_line'] = line_number
+        row['_reason'] = reason
+        if self.file_format == 'csv':
+            if self._csv_writer is None:
+                fieldnames = list(row.keys())
+                self._csv_writer = csv.DictWriter(self._file, fieldnames=fieldnames, extrasaction='ignore')
+                self._csv_writer.writeheader()
+            self._csv_writer.writerow(row)
+        else:
+            self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+VALIDATORS = {'students': validate_student, 'courses': validate_course}
+
+
+def _validate_chunk(kind, header, items):
+    """
+    Разбирает и проверяет кусок [(номер строки, сырые данные)]; выполняется в процессе пула.
+    Возвращает [(номер строки, запись, строка для БД или None, причина отказа или None)].
+    """
+    validate = VALIDATORS[kind]
+    results = []
+    for line_number, raw in items:
+        record = parse_record(header, raw)
+        row, reason = validate(record)
+        results.append((line_number, record, row, reason))
+    return results
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _validated_in_pool(kind, header, raw_items, workers, chunk_size):
+    """
+    Проверяет куски файла в пуле из workers процессов и выдает результаты в исходном
+    порядке. В работе одновременно не больше 2 * workers кусков, так что файл не
+    читается в память целиком, даже если запись в БД отстает от проверки.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for chunk in _chunked(raw_items, chunk_size):
+            in_flight.append(pool.submit(_validate_chunk, kind, header, chunk))
+            if len(in_flight) >= 2 * workers:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def _flush_batch(kind, batch, rejects):
+    """Записывает пачку [(номер строки, запись, строка для БД)]; возвращает число вставленных строк."""
+    rows = [row for _, _, row in batch]
+    try:
+        if kind == 'courses':
+            db_manager.add_courses_batch_db(rows)
+            return len(batch)
+        duplicates = db_manager.add_students_batch_db(rows)
+    except db_manager.DatabaseError as e:
+        for line_number, record, _ in batch:
+            rejects.write(line_number, record, f"ошибка записи в БД: {e}")
+        return 0
+    for index in duplicates:
+        line_number, record, _ = batch[index]
+        rejects.write(line_number, record, "email уже существует")
+    return len(batch) - len(duplicates)
+
+
+def import_file(path, kind, file_format=None, batch_size=BATCH_SIZE, rejects_path=None, progress=None,
+                workers=1, chunk_size=CHUNK_SIZE):
+    """
+    Импортирует студентов (kind='students') или курсы (kind='courses') из файла.
+    :param progress: Необязательный колбэк progress(обработано строк) после каждой пачки.
+    :param workers: Число процессов для разбора и проверки строк; 1 - все в текущем процессе.
+    :param chunk_size: Строк в одном задании для процесса проверки.
+    :return: ImportReport(total, imported, rejected, seconds, rejects_path).
+    """
+    file_format = file_format or detect_format(path)
+    rejects_path = rejects_path or f"{os.path.splitext(path)[0]}.rejects.{file_format}"
+    rejects = RejectWriter(rejects_path, file_format)
+
+    started = time.perf_counter()
+    total = imported = 0
+    batch = []
+    try:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            header, raw_items = _raw_reader(f, file_format)
+            if workers > 1:
+                validated = _validated_in_pool(kind, header, raw_items, workers, chunk_size)
+            else:
+                validated = (item for chunk in _chunked(raw_items, chunk_size)
+                             for item in _validate_chunk(kind, header, chunk))
+
+            for line_number, record, row, reason in validated:
+                total += 1
+                if reason:
+                    rejects.write(line_number, record, reason)
+                    continue
+                batch.append((line_number, record, row))
+                if len(batch) >= batch_size:
+                    imported += _flush_batch(kind, batch, rejects)
+                    batch = []
+                    if progress:
+                        progress(total)
+            if batch:
+                imported += _flush_batch(kind, batch, rejects)
+                if progress:
+                    progress(total)
+    finally:
+        rejects.close()
+
+    return ImportReport(total, imported, rejects.count, time.perf_counter() - started,
+                        rejects_path if rejects.count else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="файл CSV или JSON Lines")
+    parser.add_argument("--kind", choices=("students", "courses"), required=True)
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="по умолчанию - по расширению файла")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="строк в одной транзакции")
+    parser.add_argument("--rejects", help="файл отказов (по умолчанию <файл>.rejects.<формат>)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="процессов для разбора и проверки строк (0 - по числу ядер)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="строк в одном задании для процесса")
+    parser.add_argument("--db", help="файл БД (по умолчанию online_school.db)")
+    args = parser.parse_args()
+
+    if args.db:
+        db_manager.DB_NAME = args.db
+    db_manager.init_db()
+
+    workers = args.workers or os.cpu_count() or 1
+    report = import_file(args.path, args.kind, args.format, args.batch_size, args.rejects,
+                         progress=lambda done: print(f"Обработано строк: {done}", end="\r"),
+                         workers=workers, chunk_size=args.chunk_size)
+    print(f"Обработано строк: {report.total}, импортировано: {report.imported}, "
+          f"отклонено: {report.rejected} за {report.seconds:.1f} с ({report.rows_per_second:.0f} строк/с)")
+    if report.rejects_path:
+        print(f"Отклоненные строки: {report.rejects_path}")
+    db_manager.close_pool()
+
+
+if __name__ == "__main__":
+    main()
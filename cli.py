@@ -0,0 +1,175 @@
+"""
+Командная строка для обслуживания БД онлайн-школы без графического интерфейса.
+
+Команды вызывают database_manager напрямую; tkinter не загружается, поэтому
+скрипт подходит для ночных пакетных заданий на сервере без дисплея. Ошибки БД
+не показываются диалогом, а завершают команду с кодом 1; с ключом --json
+результат (или ошибка) выводится одной строкой JSON.
+
+Запуск:
+    python cli.py init
+    python cli.py import students.csv --kind students --workers 4
+    python cli.py export courses courses.csv.gz --search python
+    python cli.py --json stats
+    python cli.py vacuum
+    python cli.py user add admin --password-stdin < password.txt
+    python cli.py --db other.db stats
+"""
+import argparse
+import getpass
+import json
+import os
+import sqlite3
+import sys
+
+import database_manager as db_manager
+import bulk_import
+import exporter
+
+
+class CliError(Exception):
+    """Ошибка выполнения команды: сообщение для пользователя и код завершения 1."""
+
+    def __init__(self, title, message):
+        super().__init__(f"{title}: {message}")
+        self.title = title
+        self.message = message
+
+
+def cmd_init(args):
+    db_manager.init_db()
+    return {'db_name': db_manager.DB_NAME, 'schema_version': db_manager.get_schema_version(),
+            'fts_enabled': db_manager._fts_enabled()}
+
+
+def cmd_import(args):
+    db_manager.init_db()
+    workers = args.workers or os.cpu_count() or 1
+    progress = None
+    if not args.json:
+        progress = lambda done: print(f"Обработано строк: {done}", end="\r", file=sys.stderr)
+    report = bulk_import.import_file(args.path, args.kind, args.format, args.batch_size, args.rejects,
+                                     progress=progress, workers=workers, chunk_size=args.chunk_size)
+    if progress:
+        print(file=sys.stderr)
+    result = report._asdict()
+    result['rows_per_second'] = round(report.rows_per_second)
+    result['seconds'] = round(report.seconds, 3)
+    return result
+
+
+def cmd_export(args):
+    report = exporter.export_rows(args.kind, args.path, args.format, args.gzip, args.search,
+                                  args.sort_by, args.order)
+    result = report._asdict()
+    result['seconds'] = round(report.seconds, 3)
+    return result
+
+
+def cmd_stats(args):
+    return db_manager.get_db_stats()
+
+
+def cmd_vacuum(args):
+    result = db_manager.vacuum_db()
+    result['seconds'] = round(result['seconds'], 3)
+    return result
+
+
+def cmd_user_add(args):
+    if args.password_stdin:
+        password = sys.stdin.readline().rstrip("\r\n")
+    else:
+        password = getpass.getpass("Пароль: ")
+    if not args.username or not password:
+        raise CliError("Ошибка", "Имя пользователя и пароль не могут быть пустыми.")
+    result = db_manager.add_user_db(args.username, password)
+    if result == "integrity_error":
+        raise CliError("Ошибка", f"Пользователь '{args.username}' уже существует.")
+    return {'username': args.username}
+
+
+def _print_result(result, prefix=""):
+    """Выводит словарь результата в виде строк "ключ: значение"."""
+    for key, value in result.items():
+        if isinstance(value, dict):
+            print(f"{prefix}{key}:")
+            _print_result(value, prefix + "  ")
+        elif value is not None:
+            print(f"{prefix}{key}: {value}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="файл БД (по умолчанию online_school.db)")
+    parser.add_argument("--json", action="store_true", help="вывести результат одной строкой JSON")
+    commands = parser.add_subparsers(dest="command", metavar="команда")
+    commands.required = True
+
+    init_parser = commands.add_parser("init", help="применить миграции схемы и догрузить FTS5-индекс")
+    init_parser.set_defaults(handler=cmd_init)
+
+    import_parser = commands.add_parser("import", help="массовый импорт студентов или курсов")
+    import_parser.add_argument("path", help="файл CSV или JSON Lines")
+    import_parser.add_argument("--kind", choices=("students", "courses"), required=True)
+    import_parser.add_argument("--format", choices=("csv", "jsonl"), help="по умолчанию - по расширению файла")
+    import_parser.add_argument("--batch-size", type=int, default=bulk_import.BATCH_SIZE, help="строк в одной транзакции")
+    import_parser.add_argument("--rejects", help="файл отказов (по умолчанию <файл>.rejects.<формат>)")
+    import_parser.add_argument("--workers", type=int, default=1,
+                               help="процессов для разбора и проверки строк (0 - по числу ядер)")
+    import_parser.add_argument("--chunk-size", type=int, default=bulk_import.CHUNK_SIZE,
+                               help="строк в одном задании для процесса")
+    import_parser.set_defaults(handler=cmd_import)
+
+    export_parser = commands.add_parser("export", help="экспорт в CSV или JSON Lines")
+    export_parser.add_argument("kind", choices=exporter.EXPORT_KINDS)
+    export_parser.add_argument("path", help="выходной файл (.csv, .jsonl, можно с .gz)")
+    export_parser.add_argument("--format", choices=("csv", "jsonl"), help="по умолчанию - по расширению файла")
+    export_parser.add_argument("--gzip", action="store_true", default=None, help="сжать gzip (по умолчанию - для .gz)")
+    export_parser.add_argument("--search", help="поисковый запрос (только для курсов)")
+    export_parser.add_argument("--sort-by", help="столбец сортировки")
+    export_parser.add_argument("--order", choices=("ASC", "DESC"), default="ASC")
+    export_parser.set_defaults(handler=cmd_export)
+
+    stats_parser = commands.add_parser("stats", help="число строк в таблицах и размер БД")
+    stats_parser.set_defaults(handler=cmd_stats)
+
+    vacuum_parser = commands.add_parser("vacuum", help="VACUUM, ANALYZE и оптимизация FTS5-индекса")
+    vacuum_parser.set_defaults(handler=cmd_vacuum)
+
+    user_parser = commands.add_parser("user", help="управление пользователями")
+    user_commands = user_parser.add_subparsers(dest="user_command", metavar="действие")
+    user_commands.required = True
+    user_add_parser = user_commands.add_parser("add", help="зарегистрировать пользователя")
+    user_add_parser.add_argument("username")
+    user_add_parser.add_argument("--password-stdin", action="store_true",
+                                 help="прочитать пароль из первой строки stdin (иначе - запрос без эха)")
+    user_add_parser.set_defaults(handler=cmd_user_add)
+    return parser
+
+
+def main(argv=None):
+    """Выполняет команду; возвращает код завершения (0 - успех, 1 - ошибка)."""
+    args = build_parser().parse_args(argv)
+    if args.db:
+        db_manager.DB_NAME = args.db
+    try:
+        result = args.handler(args)
+    except (CliError, db_manager.DatabaseError, sqlite3.Error, OSError, ValueError) as e:
+        if args.json:
+            print(json.dumps({'ok': False, 'error': str(e)}, ensure_ascii=False))
+        else:
+            print(e, file=sys.stderr)
+        return 1
+    finally:
+        db_manager.close_pool()
+
+    if args.json:
+        print(json.dumps(dict(result, ok=True), ensure_ascii=False))
+    else:
+        _print_result(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,13 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import webbrowser
 import database_manager as db_manager 
-from utils import validate_youtube_link, make_text_widget_clipboard_aware 
+import db_worker
+from virtual_tree import VirtualTreeview
+from live_search import LiveSearch
+import exporter
+from utils import validate_youtube_link, make_text_widget_clipboard_aware, COURSE_LEVELS, ask_export_path, show_export_result 
+
+YOUTUBE_MARK = "▶ YouTube"   # отметка в столбце ссылки; сама ссылка открывается двойным щелчком
 
 class CoursesUI:
     def __init__(self, parent_notebook, app_instance):
@@ -23,6 +29,7 @@ class CoursesUI:
         self.sort_order_asc = True
         self.current_search_term = None
         self.selected_course_id = None
+        self.details_course_id = None   # курс, чьи описание и ссылка загружены в поля формы
 
         
         self.column_map = {
@@ -33,11 +40,13 @@ class CoursesUI:
             
         }
         
-        self.tree_columns_ordered = ("id", "title", "description", "instructor", "level", "youtube")
+        self.tree_columns_ordered = ("id", "title", "snippet", "instructor", "level", "youtube")
+        # Без поиска столбец фрагмента описания скрыт: список не загружает описания.
+        self.listing_columns = tuple(col for col in self.tree_columns_ordered if col != "snippet")
 
 
         self._setup_widgets()
-        self.refresh_courses_list()
+        self._apply_query()
 
     def _setup_widgets(self):
         
@@ -63,7 +72,7 @@ class CoursesUI:
         ttk.Label(input_frame, text="Уровень:").grid(row=3, column=0, padx=5, pady=5, sticky="w")
         self.level_var = tk.StringVar()
         self.level_combo = ttk.Combobox(input_frame, textvariable=self.level_var,
-                                        values=["Начальный", "Средний", "Продвинутый"], state="readonly")
+                                        values=list(COURSE_LEVELS), state="readonly")
         self.level_combo.grid(row=3, column=1, padx=5, pady=5, sticky="ew")
         self.level_combo.set("Начальный")
 
@@ -77,28 +86,39 @@ class CoursesUI:
         crud_button_frame = ttk.Frame(self.frame)
         crud_button_frame.pack(pady=5, fill="x", padx=10)
         ttk.Button(crud_button_frame, text="Добавить", command=self.add_course).pack(side=tk.LEFT, padx=5)
-        ttk.Button(crud_button_frame, text="Обновить", command=self.update_course).pack(side=tk.LEFT, padx=5)
+        self.update_button = ttk.Button(crud_button_frame, text="Обновить", command=self.update_course)
+        self.update_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(crud_button_frame, text="Удалить", command=self.delete_course).pack(side=tk.LEFT, padx=5)
         ttk.Button(crud_button_frame, text="Очистить поля", command=self.clear_input_fields).pack(side=tk.LEFT, padx=5)
         
         
         search_refresh_frame = ttk.Frame(self.frame)
         search_refresh_frame.pack(pady=5, fill="x", padx=10)
-        ttk.Label(search_refresh_frame, text="Поиск по названию:").pack(side=tk.LEFT, padx=5)
+        ttk.Label(search_refresh_frame, text="Поиск (название, описание, преподаватель):").pack(side=tk.LEFT, padx=5)
         self.search_entry = ttk.Entry(search_refresh_frame, width=30)
         self.search_entry.pack(side=tk.LEFT, padx=5)
+        self.live_search = LiveSearch(self.search_entry, self.perform_search, lambda: self.current_search_term)
+        self.search_entry.bind("<Return>", lambda e: self.perform_search())
         ttk.Button(search_refresh_frame, text="Найти", command=self.perform_search).pack(side=tk.LEFT, padx=5)
         ttk.Button(search_refresh_frame, text="Показать все", command=self.show_all).pack(side=tk.LEFT, padx=5)
         ttk.Button(search_refresh_frame, text="Обновить список", command=self.refresh_courses_list).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(search_refresh_frame, text="Экспорт...", command=self.export_courses).pack(side=tk.RIGHT, padx=5)
 
         
-        self.courses_tree = ttk.Treeview(self.frame, columns=self.tree_columns_ordered, show="headings")
+        self.courses_list = VirtualTreeview(
+            self.frame, self.tree_columns_ordered,
+            fetch_page=self._fetch_courses_page, count_rows=self._count_courses,
+            row_to_item=self._course_to_item, db_executor=self.app_instance.db_executor,
+            key="courses", xscroll=True, data_version=lambda: db_manager.get_table_versions('courses')
+        )
+        self.courses_tree = self.courses_list.tree
         
         
         for col_id in self.tree_columns_ordered:
             text = col_id.replace("_", " ").title()
             if col_id == "id": text = "ID"
             if col_id == "instructor": text = "Преподаватель" 
+            if col_id == "snippet": text = "Фрагмент"
 
             if col_id in self.column_map: 
                 db_col_name = self.column_map[col_id]
@@ -108,24 +128,15 @@ class CoursesUI:
         
         self.courses_tree.column("id", width=40, stretch=tk.NO, anchor="center")
         self.courses_tree.column("title", width=200)
-        self.courses_tree.column("description", width=250)
+        self.courses_tree.column("snippet", width=250)
         self.courses_tree.column("instructor", width=150)
         self.courses_tree.column("level", width=100, anchor="center")
-        self.courses_tree.column("youtube", width=200)
+        self.courses_tree.column("youtube", width=100, anchor="center")
 
-        self.courses_tree.pack(padx=10, pady=10, fill="both", expand=True)
+        self.courses_list.pack(padx=10, pady=10, fill="both", expand=True)
         self.courses_tree.bind("<<TreeviewSelect>>", self.on_tree_select)
         self.courses_tree.bind("<Double-1>", self.on_tree_double_click)
 
-        
-        tree_scrollbar_y = ttk.Scrollbar(self.courses_tree, orient="vertical", command=self.courses_tree.yview)
-        tree_scrollbar_y.pack(side='right', fill='y')
-        self.courses_tree.configure(yscrollcommand=tree_scrollbar_y.set)
-        
-        tree_scrollbar_x = ttk.Scrollbar(self.courses_tree, orient="horizontal", command=self.courses_tree.xview)
-        tree_scrollbar_x.pack(side='bottom', fill='x')
-        self.courses_tree.configure(xscrollcommand=tree_scrollbar_x.set)
-
     def _sort_by_column(self, column_name_db):
         """Обрабатывает клик по заголовку для сортировки."""
         if self.sort_column == column_name_db:
@@ -133,31 +144,58 @@ class CoursesUI:
         else:
             self.sort_column = column_name_db
             self.sort_order_asc = True
-        self.refresh_courses_list()
+        self._apply_query()
+
+    @staticmethod
+    def _fetch_courses_page(offset, limit, after=None, search_term=None, sort_by='title', sort_order='ASC'):
+        """Загружает страницу курсов (выполняется в фоновом потоке); возвращает (строки, ключ)."""
+        if search_term:
+            courses = db_manager.search_courses_db(search_term, sort_by=sort_by, sort_order=sort_order,
+                                                   limit=limit, offset=offset)
+            return courses, None
+        return db_manager.get_courses_after_db(limit, after, sort_by=sort_by or 'title', sort_order=sort_order,
+                                               offset=offset)
+
+    @staticmethod
+    def _count_courses(search_term=None, **query):
+        return db_manager.count_courses_db(search_term)
+
+    @staticmethod
+    def _course_to_item(course):
+        """
+        Строка курса -> (iid, значения столбцов Treeview). Список не загружает описания и ссылки:
+        столбец фрагмента заполняется только при поиске, а в столбце ссылки - только отметка.
+        """
+        if 'title_highlight' in course.keys():
+            title_display = course['title_highlight']
+            snippet_display = course['description_snippet']
+        else:
+            title_display = course['title']
+            snippet_display = ""
+        values = (
+            course['course_id'],
+            title_display,
+            snippet_display,
+            course['instructor_name'],
+            course['level'],
+            YOUTUBE_MARK if course['has_youtube'] else ""
+        )
+        return str(course['course_id']), values
 
-    def refresh_courses_list(self):
-        """Обновляет список курсов в Treeview."""
-        for i in self.courses_tree.get_children():
-            self.courses_tree.delete(i)
-        
-        sort_order_str = "ASC" if self.sort_order_asc else "DESC"
-        courses_data = db_manager.get_all_courses_db(
+    def _apply_query(self):
+        """Передает списку текущие сортировку и поиск; список строится заново с начала."""
+        self.courses_tree.configure(
+            displaycolumns=self.tree_columns_ordered if self.current_search_term else self.listing_columns
+        )
+        self.courses_list.set_query(
             search_term=self.current_search_term,
             sort_by=self.sort_column,
-            sort_order=sort_order_str
+            sort_order="ASC" if self.sort_order_asc else "DESC"
         )
-        for course in courses_data:
-            
-            values_to_insert = (
-                course['course_id'],
-                course['title'],
-                course['description'],
-                course['instructor_name'],
-                course['level'],
-                course['youtube_link']
-            )
-            self.courses_tree.insert("", "end", values=values_to_insert)
-            
+
+    def refresh_courses_list(self):
+        """Перечитывает список курсов из БД (в фоновом потоке), сохраняя положение прокрутки."""
+        self.courses_list.refresh()
         
         if hasattr(self.app_instance, 'populate_all_favorites_comboboxes'):
              self.app_instance.populate_all_favorites_comboboxes()
@@ -176,18 +214,33 @@ class CoursesUI:
         if not validate_youtube_link(youtube_link): 
             return
 
-        if db_manager.add_course_db(title, description, instructor, level, youtube_link):
-            messagebox.showinfo("Успех", "Курс успешно добавлен.", parent=self.frame)
-            self.current_search_term = None 
-            self.search_entry.delete(0, tk.END)
-            self.refresh_courses_list()
-            self.clear_input_fields()
+        def on_added(added):
+            if added:
+                messagebox.showinfo("Успех", "Курс успешно добавлен.", parent=self.frame)
+                if self.current_search_term:
+                    
+                    self.current_search_term = None 
+                    self.search_entry.delete(0, tk.END)
+                    self.sort_column = self.sort_column or 'title'
+                    self._apply_query()
+                self.refresh_courses_list()
+                self.clear_input_fields()
+
+        self.app_instance.submit_id_change(
+            db_manager.add_course_db, title, description, instructor, level, youtube_link,
+            apply_change=lambda course_id: self.app_instance.course_index.set(course_id, title),
+            on_success=on_added
+        )
         
 
     def update_course(self):
         if self.selected_course_id is None:
             messagebox.showerror("Ошибка", "Сначала выберите курс для обновления.", parent=self.frame)
             return
+        if self.details_course_id != self.selected_course_id:
+            # Иначе пустые поля описания и ссылки затерли бы сохраненные значения.
+            messagebox.showinfo("Подождите", "Описание и ссылка курса еще загружаются. Повторите попытку.", parent=self.frame)
+            return
 
         title = self.title_entry.get()
         description = self.description_text.get("1.0", tk.END).strip()
@@ -201,11 +254,19 @@ class CoursesUI:
         if not validate_youtube_link(youtube_link):
             return
 
-        if db_manager.update_course_db(self.selected_course_id, title, description, instructor, level, youtube_link):
-            messagebox.showinfo("Успех", "Курс успешно обновлен.", parent=self.frame)
-            self.refresh_courses_list()
-            self.clear_input_fields()
-            self.selected_course_id = None 
+        def on_updated(updated):
+            if updated:
+                messagebox.showinfo("Успех", "Курс успешно обновлен.", parent=self.frame)
+                self.refresh_courses_list()
+                self.clear_input_fields()
+                self.selected_course_id = None 
+
+        course_id = self.selected_course_id
+        self.app_instance.submit_id_change(
+            db_manager.update_course_db, course_id, title, description, instructor, level, youtube_link,
+            apply_change=lambda _: self.app_instance.course_index.set(course_id, title),
+            on_success=on_updated
+        )
         
 
     def delete_course(self):
@@ -214,17 +275,27 @@ class CoursesUI:
             return
 
         if messagebox.askyesno("Подтверждение", "Вы уверены, что хотите удалить этот курс?\nЭто также удалит все связанные записи в 'Избранном'.", parent=self.frame):
-            if db_manager.delete_course_db(self.selected_course_id):
-                messagebox.showinfo("Успех", "Курс успешно удален.", parent=self.frame)
-                self.refresh_courses_list()
-                
-                if hasattr(self.app_instance, 'refresh_favorites_tab_data'):
-                    self.app_instance.refresh_favorites_tab_data()
-                self.clear_input_fields()
-                self.selected_course_id = None
+            def on_deleted(deleted):
+                if deleted:
+                    messagebox.showinfo("Успех", "Курс успешно удален.", parent=self.frame)
+                    self.refresh_courses_list()
+                    
+                    if hasattr(self.app_instance, 'refresh_favorites_tab_data'):
+                        self.app_instance.refresh_favorites_tab_data()
+                    self.clear_input_fields()
+                    self.selected_course_id = None
+
+            course_id = self.selected_course_id
+            self.app_instance.submit_id_change(
+                db_manager.delete_course_db, course_id,
+                apply_change=lambda _: self.app_instance.course_index.remove(course_id),
+                on_success=on_deleted
+            )
             
 
     def clear_input_fields(self):
+        self._set_details_editable(True)
+        self.details_course_id = None
         self.title_entry.delete(0, tk.END)
         self.description_text.delete("1.0", tk.END)
         self.description_text.edit_reset() 
@@ -236,39 +307,84 @@ class CoursesUI:
             self.courses_tree.selection_remove(self.courses_tree.focus())
 
     def perform_search(self):
+        self.live_search.cancel()
         self.current_search_term = self.search_entry.get().strip()
-        self.refresh_courses_list()
+        
+        self.sort_column = None if self.current_search_term else (self.sort_column or 'title')
+        self.sort_order_asc = True
+        self._apply_query()
 
     def show_all(self):
+        self.live_search.cancel()
         self.current_search_term = None
         self.search_entry.delete(0, tk.END)
-        self.refresh_courses_list()
+        self.sort_column = self.sort_column or 'title'
+        self._apply_query()
+
+    def export_courses(self):
+        """Экспортирует курсы (с текущими поиском и сортировкой) в файл в фоновом потоке."""
+        path = ask_export_path(self.frame, "courses.csv")
+        if not path:
+            return
+        on_success, on_error = show_export_result(self.frame)
+        db_worker.run_in_thread(
+            self.frame, exporter.export_rows, "courses", path, search_term=self.current_search_term,
+            sort_by=self.sort_column, sort_order="ASC" if self.sort_order_asc else "DESC",
+            on_success=on_success, on_error=on_error
+        )
 
     def on_tree_select(self, event):
         selected_item_iid = self.courses_tree.focus()
         if not selected_item_iid:
-            self.selected_course_id = None
+            
             return
         
-        item_values = self.courses_tree.item(selected_item_iid, 'values')
-        if item_values:
-            
-            col_order = self.tree_columns_ordered
-            self.selected_course_id = item_values[col_order.index("id")]
+        
+        course = self.courses_list.row(selected_item_iid)
+        if course and course['course_id'] != self.selected_course_id:
+            self.selected_course_id = course['course_id']
             
             self.title_entry.delete(0, tk.END)
-            self.title_entry.insert(0, item_values[col_order.index("title")])
+            self.title_entry.insert(0, course['title'])
             
+            self.details_course_id = None
+            self._set_details_editable(True)
             self.description_text.delete("1.0", tk.END)
-            self.description_text.insert("1.0", item_values[col_order.index("description")] or "")
             
             self.instructor_entry.delete(0, tk.END)
-            self.instructor_entry.insert(0, item_values[col_order.index("instructor")] or "")
+            self.instructor_entry.insert(0, course['instructor_name'] or "")
             
-            self.level_var.set(item_values[col_order.index("level")] or "Начальный")
+            self.level_var.set(course['level'] or "Начальный")
             
             self.youtube_entry.delete(0, tk.END)
-            self.youtube_entry.insert(0, item_values[col_order.index("youtube")] or "")
+
+            # Описание и ссылка не входят в строки списка - догружаем их (из кэша, если курс уже открывали).
+            # До загрузки поля и кнопка "Обновить" недоступны: ни ввод пользователя не будет
+            # затерт поздним ответом, ни пустые значения не попадут в БД.
+            self._set_details_editable(False)
+            self.app_instance.db_executor.submit(
+                db_manager.get_course_db, course['course_id'], key="courses.detail",
+                on_success=self._show_course_details
+            )
+
+    def _set_details_editable(self, editable):
+        """Включает или отключает поля описания и ссылки и кнопку "Обновить"."""
+        self.description_text.configure(state=tk.NORMAL if editable else tk.DISABLED)
+        self.youtube_entry.state(["!disabled"] if editable else ["disabled"])
+        self.update_button.state(["!disabled"] if editable else ["disabled"])
+
+    def _show_course_details(self, course):
+        """Заполняет описание и ссылку выбранного курса, если выбор с тех пор не изменился."""
+        if course is None or course['course_id'] != self.selected_course_id:
+            return
+        self._set_details_editable(True)
+        self.details_course_id = course['course_id']
+        self.description_text.delete("1.0", tk.END)
+        self.description_text.insert("1.0", course['description'] or "")
+        self.description_text.edit_reset()
+
+        self.youtube_entry.delete(0, tk.END)
+        self.youtube_entry.insert(0, course['youtube_link'] or "")
 
     def on_tree_double_click(self, event):
         region = self.courses_tree.identify_region(event.x, event.y)
@@ -281,15 +397,22 @@ class CoursesUI:
         
         
         column_id_str = self.courses_tree.identify_column(event.x) 
-        column_index = int(column_id_str.replace("#", "")) -1 
-        
-        clicked_column_name = self.tree_columns_ordered[column_index]
+        # "#n" - номер среди видимых столбцов (displaycolumns), а не в tree_columns_ordered
+        clicked_column_name = self.courses_tree.column(column_id_str, "id")
 
         if clicked_column_name != "youtube": 
             return
 
-        item_values = self.courses_tree.item(selected_item_iid, 'values')
-        youtube_link_value = item_values[self.tree_columns_ordered.index("youtube")]
+        course = self.courses_list.row(selected_item_iid)
+        if not course:
+            return
+        self.app_instance.db_executor.submit(
+            db_manager.get_course_db, course['course_id'], key="courses.open_link",
+            on_success=self._open_youtube_link
+        )
+
+    def _open_youtube_link(self, course):
+        youtube_link_value = course['youtube_link'] if course else None
 
         if youtube_link_value: 
             try:
@@ -311,10 +434,14 @@ if __name__ == '__main__':
 
     
     class MockApp:
+        def __init__(self):
+            self.db_executor = db_worker.DbExecutor(root_test)
         def populate_all_favorites_comboboxes(self):
             print("MockApp: populate_all_favorites_comboboxes called")
         def refresh_favorites_tab_data(self):
             print("MockApp: refresh_favorites_tab_data called")
+        def submit_id_change(self, func, *args, apply_change, on_success=None):
+            self.db_executor.submit(func, *args, on_success=on_success)
 
     mock_app_instance = MockApp()
 
@@ -1,22 +1,497 @@
 import sqlite3
 import hashlib
-from tkinter import messagebox 
+import os
+import threading
+import queue
+import atexit
+import time
+import random
+import re
+import functools
+from collections import OrderedDict
+from contextlib import contextmanager
 
 DB_NAME = 'online_school.db'
+POOL_SIZE = 5            # максимальное число открытых соединений в пуле
+POOL_TIMEOUT = 10.0      # сколько секунд ждать свободное соединение
+STATEMENT_CACHE_SIZE = 256
 
-def get_db_connection():
-    """Устанавливает соединение с БД и включает поддержку внешних ключей."""
-    conn = sqlite3.connect(DB_NAME)
+# Профиль PRAGMA, применяемый к каждому новому соединению.
+# WAL позволяет читателям не блокировать писателя (и наоборот), а busy_timeout
+# заставляет SQLite подождать, пока другой экземпляр приложения завершит запись.
+PRAGMA_PROFILE = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',      # в режиме WAL безопасно и заметно быстрее FULL
+    'cache_size': -16000,         # отрицательное значение - размер в КиБ (~16 МБ)
+    'mmap_size': 268435456,       # 256 МБ
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,         # мс
+}
+
+# Повтор записи при SQLITE_BUSY, если busy_timeout не хватило.
+BUSY_RETRIES = 5
+BUSY_BACKOFF = 0.05               # начальная задержка, с
+BUSY_BACKOFF_MAX = 2.0
+
+QUERY_CACHE_SIZE = 256            # сколько результатов запросов хранить в кэше чтения
+
+class DatabaseError(Exception):
+    """
+    Ошибка записи или обслуживания БД с сообщением для пользователя.
+    Исходная ошибка sqlite3 доступна в __cause__. Слой данных не показывает диалогов:
+    в интерфейсе ошибку показывает db_worker.show_db_error, в командной строке - cli.py.
+    """
+    title = "Ошибка БД"
+
+def get_db_connection(db_name=None):
+    """Устанавливает соединение с БД, включает поддержку внешних ключей и применяет PRAGMA_PROFILE."""
+    busy_timeout_ms = PRAGMA_PROFILE.get('busy_timeout', 0)
+    conn = sqlite3.connect(db_name or DB_NAME, timeout=busy_timeout_ms / 1000,
+                           check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
     conn.row_factory = sqlite3.Row 
     conn.execute("PRAGMA foreign_keys = ON;")
+    for pragma, value in PRAGMA_PROFILE.items():
+        conn.execute(f"PRAGMA {pragma} = {value};").fetchall()
     return conn
 
-def init_db():
-    """Инициализирует таблицы в базе данных, если они не существуют."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def configure_pragmas(**overrides):
+    """
+    Меняет профиль PRAGMA (например, configure_pragmas(synchronous='FULL')).
+    Значение None убирает PRAGMA из профиля. Пул пересоздается, чтобы
+    новые соединения открылись уже с новыми настройками.
+    """
+    for pragma, value in overrides.items():
+        if value is None:
+            PRAGMA_PROFILE.pop(pragma, None)
+        else:
+            PRAGMA_PROFILE[pragma] = value
+    close_pool()
 
-    
+
+class ConnectionPool:
+    """
+    Пул долгоживущих соединений с БД.
+    Соединение закрепляется за потоком, пока он с ним работает (вложенные вызовы
+    в том же потоке получают то же соединение), а затем возвращается в пул.
+    Так между вызовами сохраняются кэш страниц и кэш подготовленных выражений SQLite.
+    """
+    def __init__(self, db_name, max_size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_name = db_name
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.closed = False
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open_count = 0
+        self._local = threading.local()
+        self._data_versions = {}   # id(соединения) -> последнее прочитанное PRAGMA data_version
+
+    def _is_healthy(self, conn):
+        """Проверяет, что соединение живо и не осталось в незавершенной транзакции."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._open_count -= 1
+            self._data_versions.pop(id(conn), None)
+
+    def data_changed(self, conn):
+        """
+        Проверяет по PRAGMA data_version, зафиксировало ли другое соединение (в том числе
+        из другого процесса) изменения в БД с прошлой проверки на этом соединении.
+        Для соединения, которое проверяется впервые, ответ всегда "да".
+        """
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        with self._lock:
+            last_version = self._data_versions.get(id(conn))
+            self._data_versions[id(conn)] = version
+        return last_version != version
+
+    def _checkout(self):
+        """Берет свободное соединение из пула или открывает новое, если лимит не исчерпан."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_open = self._open_count < self.max_size
+                    if can_open:
+                        self._open_count += 1
+                if can_open:
+                    try:
+                        return get_db_connection(self.db_name)
+                    except sqlite3.Error:
+                        with self._lock:
+                            self._open_count -= 1
+                        raise
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError("Нет свободных соединений в пуле БД")
+            if self._is_healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if self.closed:
+            self._discard(conn)
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Контекстный менеджер: выдает соединение текущему потоку и возвращает его в пул."""
+        if self.closed:
+            raise sqlite3.ProgrammingError("Пул соединений уже закрыт")
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._checkout()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    def close_all(self):
+        """Закрывает пул: свободные соединения сразу, занятые - при возврате."""
+        self.closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Возвращает общий пул соединений (создает его при первом обращении или смене DB_NAME)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed or _pool.db_name != DB_NAME:
+            if _pool is not None:
+                _pool.close_all()
+            _pool = ConnectionPool(DB_NAME, POOL_SIZE, POOL_TIMEOUT)
+        return _pool
+
+def configure_pool(max_size=None, timeout=None):
+    """Меняет параметры пула; новые значения применяются к заново созданному пулу."""
+    global POOL_SIZE, POOL_TIMEOUT
+    if max_size is not None:
+        POOL_SIZE = max_size
+    if timeout is not None:
+        POOL_TIMEOUT = timeout
+    close_pool()
+
+def close_pool():
+    """Закрывает все соединения пула (вызывается и при завершении процесса)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+
+atexit.register(close_pool)
+
+def db_connection():
+    """Сокращение для get_pool().connection()."""
+    return get_pool().connection()
+
+def _is_busy_error(error):
+    """Проверяет, что ошибка вызвана блокировкой БД другим соединением."""
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return (code & 0xff) in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+# Счетчики версий таблиц: увеличиваются после каждой зафиксированной записи в таблицу.
+# По ним интерфейс определяет, изменились ли данные с момента последней загрузки.
+_table_versions = {'users': 0, 'courses': 0, 'students': 0, 'favorites': 0}
+_table_versions_lock = threading.Lock()
+
+def get_table_versions(*tables):
+    """Возвращает кортеж текущих версий указанных таблиц."""
+    with _table_versions_lock:
+        return tuple(_table_versions[table] for table in tables)
+
+def _bump_table_versions(tables):
+    with _table_versions_lock:
+        for table in tables:
+            _table_versions[table] += 1
+
+def _run_write(work, tables=()):
+    """
+    Выполняет work(conn) и фиксирует транзакцию.
+    При SQLITE_BUSY транзакция откатывается и повторяется с экспоненциальной задержкой.
+    :param tables: Таблицы, которые изменяет work (включая каскадные удаления);
+                   после фиксации их версии увеличиваются.
+    """
+    delay = BUSY_BACKOFF
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            with db_connection() as conn:
+                try:
+                    result = work(conn)
+                    conn.commit()
+                    _bump_table_versions(tables)
+                    return result
+                except BaseException:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    raise
+        except sqlite3.OperationalError as e:
+            if attempt == BUSY_RETRIES or not _is_busy_error(e):
+                raise
+            time.sleep(delay * (1 + random.random()))
+            delay = min(delay * 2, BUSY_BACKOFF_MAX)
+
+class QueryCache:
+    """
+    LRU-кэш результатов запросов чтения. Каждая запись помечена версиями таблиц,
+    из которых она прочитана; если хотя бы одна из таблиц с тех пор изменилась,
+    запись считается устаревшей и запрос выполняется заново.
+    """
+    _MISS = object()
+
+    def __init__(self, max_entries=QUERY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, versions):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != versions:
+                self.misses += 1
+                return self._MISS
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, versions, result):
+        with self._lock:
+            self._entries[key] = (versions, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_query_cache = QueryCache()
+
+def clear_query_cache():
+    """Очищает кэш результатов запросов."""
+    _query_cache.clear()
+
+def _check_external_changes(conn):
+    """Если БД изменило другое соединение или процесс, помечает все таблицы измененными."""
+    if get_pool().data_changed(conn):
+        _bump_table_versions(list(_table_versions))
+
+def _copy_result(result):
+    """Поверхностная копия результата, чтобы вызывающий код не изменил запись кэша."""
+    if isinstance(result, list):
+        return list(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return (list(result[0]),) + result[1:]
+    return result
+
+def _cached_read(*tables):
+    """
+    Декоратор функций чтения: результат берется из кэша, пока не изменились таблицы tables.
+    Локальная запись увеличивает версии таблиц в _run_write, а запись из другого
+    процесса обнаруживается через PRAGMA data_version перед каждым обращением к кэшу.
+    Полные списки таблиц (get_all_*_db) не кэшируются: их читают только после изменения
+    таблиц, так что запись не пригодилась бы, а держала бы в памяти весь список.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                key = (DB_NAME, func.__name__, args, tuple(sorted(kwargs.items())))
+                hash(key)
+            except TypeError:
+                return func(*args, **kwargs)
+            with db_connection() as conn:
+                _check_external_changes(conn)
+                versions = get_table_versions(*tables)
+                result = _query_cache.get(key, versions)
+                if result is QueryCache._MISS:
+                    result = func(*args, **kwargs)
+                    _query_cache.put(key, versions, result)
+            return _copy_result(result)
+        return wrapper
+    return decorator
+
+# Вторичные индексы: столбцы, по которым сортируются списки, и столбцы соединений.
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_courses_title ON courses(title)",
+    "CREATE INDEX IF NOT EXISTS idx_courses_instructor_name ON courses(instructor_name)",
+    "CREATE INDEX IF NOT EXISTS idx_courses_level ON courses(level)",
+    "CREATE INDEX IF NOT EXISTS idx_students_name ON students(name)",
+    # Покрывающий индекс со стороны курса: по нему ON DELETE CASCADE находит строки
+    # избранного удаляемого курса, а соединение по course_id не читает саму таблицу.
+    "DROP INDEX IF EXISTS idx_favorites_course_id",
+    "CREATE INDEX IF NOT EXISTS idx_favorites_course_covering "
+    "ON favorites(course_id, student_id, is_favorite, likes)",
+    # Сортировка избранного по статусу и лайкам с первичным ключом в роли
+    # "тай-брейкера", чтобы постраничная выборка была устойчивой.
+    "DROP INDEX IF EXISTS idx_favorites_is_favorite",
+    "DROP INDEX IF EXISTS idx_favorites_likes",
+    "CREATE INDEX IF NOT EXISTS idx_favorites_by_is_favorite ON favorites(is_favorite, student_id, course_id)",
+    "CREATE INDEX IF NOT EXISTS idx_favorites_by_likes ON favorites(likes, student_id, course_id)",
+)
+
+# Полнотекстовый индекс курсов (FTS5, внешнее содержимое - таблица courses).
+# Триггеры поддерживают его в актуальном состоянии при любых изменениях курсов.
+COURSES_FTS_TABLE = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS courses_fts USING fts5(
+    title, description, instructor_name,
+    content='courses', content_rowid='course_id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+)'''
+
+# Пока для существующих курсов идет догрузка индекса (см. run_backfills), триггеры
+# обрабатывают только уже проиндексированные строки (course_id <= last_key),
+# остальные строки догрузка прочитает сама в их текущем виде.
+_FTS_INDEXED = '''NOT EXISTS (SELECT 1 FROM schema_backfills
+                          WHERE name = 'courses_fts' AND {row}.course_id > last_key)'''
+
+COURSES_FTS_TRIGGERS = (
+    f'''CREATE TRIGGER IF NOT EXISTS courses_fts_ai AFTER INSERT ON courses
+    WHEN {_FTS_INDEXED.format(row='new')} BEGIN
+        INSERT INTO courses_fts (rowid, title, description, instructor_name)
+        VALUES (new.course_id, new.title, new.description, new.instructor_name);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS courses_fts_ad AFTER DELETE ON courses
+    WHEN {_FTS_INDEXED.format(row='old')} BEGIN
+        INSERT INTO courses_fts (courses_fts, rowid, title, description, instructor_name)
+        VALUES ('delete', old.course_id, old.title, old.description, old.instructor_name);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS courses_fts_au AFTER UPDATE OF title, description, instructor_name ON courses
+    WHEN {_FTS_INDEXED.format(row='old')} BEGIN
+        INSERT INTO courses_fts (courses_fts, rowid, title, description, instructor_name)
+        VALUES ('delete', old.course_id, old.title, old.description, old.instructor_name);
+        INSERT INTO courses_fts (rowid, title, description, instructor_name)
+        VALUES (new.course_id, new.title, new.description, new.instructor_name);
+    END''',
+)
+
+# Триграммный индекс имен и email студентов для нечеткого поиска (токенизатор
+# trigram, SQLite 3.34+). Как и courses_fts, индекс внешнего содержимого ведут
+# триггеры на таблице students, поэтому его обновляют add_student_db,
+# update_student_db, delete_student_db и пакетный импорт.
+STUDENT_TRIGRAMS_TABLE = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS student_trigrams USING fts5(
+    name, email,
+    content='students', content_rowid='student_id',
+    tokenize='trigram'
+)'''
+
+_STUDENT_TRIGRAMS_INDEXED = '''NOT EXISTS (SELECT 1 FROM schema_backfills
+                          WHERE name = 'student_trigrams' AND {row}.student_id > last_key)'''
+
+STUDENT_TRIGRAMS_TRIGGERS = (
+    f'''CREATE TRIGGER IF NOT EXISTS student_trigrams_ai AFTER INSERT ON students
+    WHEN {_STUDENT_TRIGRAMS_INDEXED.format(row='new')} BEGIN
+        INSERT INTO student_trigrams (rowid, name, email) VALUES (new.student_id, new.name, new.email);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS student_trigrams_ad AFTER DELETE ON students
+    WHEN {_STUDENT_TRIGRAMS_INDEXED.format(row='old')} BEGIN
+        INSERT INTO student_trigrams (student_trigrams, rowid, name, email)
+        VALUES ('delete', old.student_id, old.name, old.email);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS student_trigrams_au AFTER UPDATE OF name, email ON students
+    WHEN {_STUDENT_TRIGRAMS_INDEXED.format(row='old')} BEGIN
+        INSERT INTO student_trigrams (student_trigrams, rowid, name, email)
+        VALUES ('delete', old.student_id, old.name, old.email);
+        INSERT INTO student_trigrams (rowid, name, email) VALUES (new.student_id, new.name, new.email);
+    END''',
+)
+
+# Веса столбцов для bm25: совпадение в названии важнее, чем в описании.
+FTS_RANK_WEIGHTS = (10.0, 1.0, 5.0)
+SEARCH_RESULTS_LIMIT = 500
+STUDENT_SEARCH_THRESHOLD = 0.4    # какая доля триграмм запроса должна найтись у студента
+STUDENT_SEARCH_CANDIDATES = 200   # сколько нечетких кандидатов с наибольшим весом проверяется точно
+STUDENT_SEARCH_PIECE = 4          # длина кусков запроса, по которым ищутся нечеткие кандидаты
+STUDENT_SEARCH_PIECE_ROWS = 1000  # сколько строк индекса читается на один кусок запроса
+STREAM_BATCH_SIZE = 500       # строк за один fetchmany в iter_*_db
+# Столбцы списка курсов: без описания и ссылки, которые могут занимать килобайты на строку;
+# их загружает get_course_db при выборе курса. has_youtube - есть ли у курса ссылка.
+COURSE_LIST_COLUMNS = "course_id, title, instructor_name, level, youtube_link <> '' AS has_youtube"
+COURSE_COLUMNS = "course_id, title, description, instructor_name, level, youtube_link"
+SQL_IN_CHUNK_SIZE = 400       # значений в одном списке IN (...)/VALUES, ниже лимита параметров SQLite
+
+_index_state = {}
+
+def _index_ready(name):
+    """
+    Проверяет (один раз для каждого файла БД), что в схеме есть поисковый индекс name
+    и он заполнен; пока идет его догрузка (schema_backfills), поиск работает через LIKE.
+    """
+    state_key = (DB_NAME, name)
+    if state_key not in _index_state:
+        with db_connection() as conn:
+            names = {row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE name IN (?, 'schema_backfills')", (name,))}
+            pending = 'schema_backfills' in names and conn.execute(
+                "SELECT 1 FROM schema_backfills WHERE name = ?", (name,)).fetchone() is not None
+        _index_state[state_key] = name in names and not pending
+    return _index_state[state_key]
+
+def _fts_enabled():
+    """FTS5-индекс курсов создан и заполнен."""
+    return _index_ready('courses_fts')
+
+def build_fts_query(search_text):
+    """
+    Превращает пользовательский ввод в выражение FTS5 MATCH: каждое слово
+    ищется по префиксу ("pyth" найдет "python"), все слова должны совпасть.
+    Возвращает None, если в строке нет ни одного слова.
+    """
+    words = re.findall(r"\w+", search_text or "")
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+def text_trigrams(text):
+    """
+    Множество триграмм строки для нечеткого поиска (как в pg_trgm): текст приводится
+    к нижнему регистру, разбивается на слова, и каждое слово дополняется двумя
+    пробелами в начале и одним в конце ("иван" -> "  и", " ив", "ива", "ван", "ан ").
+    """
+    trigrams = set()
+    for word in re.findall(r"\w+", (text or "").casefold().replace("ё", "е")):
+        padded = f"  {word} "
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+def _migration_base_tables(cursor):
+    """Основные таблицы приложения и служебная таблица догрузок."""
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS users (
         user_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -24,7 +499,6 @@ def init_db():
         password_hash VARCHAR(255) NOT NULL
     )''')
 
-    
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS courses (
         course_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -35,7 +509,6 @@ def init_db():
         youtube_link VARCHAR(255) 
     )''')
 
-    
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS students (
         student_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -43,7 +516,6 @@ def init_db():
         email VARCHAR(100) UNIQUE NOT NULL
     )''')
 
-    
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS favorites (
         student_id INTEGER,
@@ -54,8 +526,167 @@ def init_db():
         FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE,
         FOREIGN KEY (course_id) REFERENCES courses(course_id) ON DELETE CASCADE
     )''')
-    conn.commit()
-    conn.close()
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS schema_backfills (
+        name TEXT PRIMARY KEY,
+        last_key INTEGER NOT NULL
+    )''')
+
+def _migration_indexes(cursor):
+    """Вторичные индексы для сортировки списков и соединений."""
+    for index_sql in INDEXES:
+        cursor.execute(index_sql)
+
+def _migration_courses_fts(cursor):
+    """
+    FTS5-индекс курсов и триггеры. Если индекса еще не было, он не заполняется здесь
+    (на большой БД это держало бы блокировку записи), а ставится в очередь догрузок.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'courses_fts'")
+    existed = cursor.fetchone() is not None
+    try:
+        cursor.execute(COURSES_FTS_TABLE)
+    except sqlite3.OperationalError:
+        # SQLite собран без FTS5 - поиск будет работать через LIKE.
+        return
+    if not existed:
+        cursor.execute("INSERT OR REPLACE INTO schema_backfills (name, last_key) VALUES ('courses_fts', 0)")
+    for trigger in ('courses_fts_ai', 'courses_fts_ad', 'courses_fts_au'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    for trigger_sql in COURSES_FTS_TRIGGERS:
+        cursor.execute(trigger_sql)
+
+def _migration_student_trigrams(cursor):
+    """Триграммный индекс студентов и триггеры; существующие строки догружаются, как и для courses_fts."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'student_trigrams'")
+    existed = cursor.fetchone() is not None
+    try:
+        cursor.execute(STUDENT_TRIGRAMS_TABLE)
+    except sqlite3.OperationalError:
+        # Нет FTS5 или токенизатора trigram (SQLite до 3.34) - поиск студентов будет через LIKE.
+        return
+    if not existed:
+        cursor.execute("INSERT OR REPLACE INTO schema_backfills (name, last_key) VALUES ('student_trigrams', 0)")
+    for trigger in ('student_trigrams_ai', 'student_trigrams_ad', 'student_trigrams_au'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    for trigger_sql in STUDENT_TRIGRAMS_TRIGGERS:
+        cursor.execute(trigger_sql)
+
+# Миграции схемы по порядку: (номер версии, функция migrate(cursor)).
+# Номер последней примененной миграции хранится в PRAGMA user_version. Миграции
+# написаны через IF NOT EXISTS, чтобы принять и БД, созданные до появления версий.
+# Изменения схемы добавляются только новой миграцией в конец списка.
+MIGRATIONS = (
+    (1, _migration_base_tables),
+    (2, _migration_indexes),
+    (3, _migration_courses_fts),
+    (4, _migration_student_trigrams),
+)
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+BACKFILL_BATCH_SIZE = 2000        # строк в одной транзакции догрузки
+BACKFILL_PAUSE = 0.01             # пауза между пачками, с: дает другим соединениям захватить запись
+
+def get_schema_version():
+    """Возвращает версию схемы БД (PRAGMA user_version)."""
+    with db_connection() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def _apply_migrations(conn):
+    """Применяет недостающие миграции и записывает новую версию в одной транзакции."""
+    conn.execute("BEGIN IMMEDIATE")
+    # Версия перечитывается под блокировкой: миграции мог уже выполнить другой процесс.
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    cursor = conn.cursor()
+    for migration_version, migrate in MIGRATIONS:
+        if migration_version > version:
+            migrate(cursor)
+    if version < SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+def init_db(backfill=True):
+    """
+    Приводит схему БД к текущей версии. Если схема актуальна, выполняется только
+    чтение PRAGMA user_version. Иначе недостающие миграции применяются по порядку
+    в одной транзакции.
+    :param backfill: Сразу выполнить отложенные догрузки (run_backfills). Интерфейс
+                     передает False и догружает данные в фоне небольшими порциями.
+    """
+    if get_schema_version() < SCHEMA_VERSION:
+        _run_write(_apply_migrations, tables=tuple(_table_versions))
+        _index_state.clear()
+    if backfill:
+        run_backfills()
+
+def _backfill_courses_fts(conn, last_key, limit):
+    """Добавляет в FTS5-индекс до limit курсов после last_key; возвращает новый last_key или None в конце."""
+    rows = conn.execute('''
+    SELECT course_id, title, description, instructor_name FROM courses
+    WHERE course_id > ? ORDER BY course_id LIMIT ?
+    ''', (last_key, limit)).fetchall()
+    conn.executemany("INSERT INTO courses_fts (rowid, title, description, instructor_name) VALUES (?, ?, ?, ?)",
+                     [tuple(row) for row in rows])
+    return rows[-1]['course_id'] if len(rows) == limit else None
+
+def _backfill_student_trigrams(conn, last_key, limit):
+    """Добавляет в триграммный индекс до limit студентов после last_key; возвращает новый last_key или None в конце."""
+    rows = conn.execute(
+        "SELECT student_id, name, email FROM students WHERE student_id > ? ORDER BY student_id LIMIT ?",
+        (last_key, limit)).fetchall()
+    conn.executemany("INSERT INTO student_trigrams (rowid, name, email) VALUES (?, ?, ?)",
+                     [tuple(row) for row in rows])
+    return rows[-1]['student_id'] if len(rows) == limit else None
+
+# Догрузки производных структур: имя в schema_backfills -> (функция пачки, таблицы,
+# результаты чтения которых меняются по окончании догрузки).
+BACKFILLS = {
+    'courses_fts': (_backfill_courses_fts, ('courses',)),
+    'student_trigrams': (_backfill_student_trigrams, ('students',)),
+}
+
+def _backfill_step(name, batch_size):
+    """Одна пачка догрузки name в своей транзакции; возвращает True, если догрузка завершена."""
+    backfill = BACKFILLS[name][0]
+
+    def work(conn):
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT last_key FROM schema_backfills WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return True
+        last_key = backfill(conn, row['last_key'], batch_size)
+        if last_key is None:
+            conn.execute("DELETE FROM schema_backfills WHERE name = ?", (name,))
+            return True
+        conn.execute("UPDATE schema_backfills SET last_key = ? WHERE name = ?", (last_key, name))
+        return False
+
+    return _run_write(work)
+
+def run_backfills(batch_size=BACKFILL_BATCH_SIZE, max_batches=None):
+    """
+    Выполняет отложенные догрузки (например, FTS5-индекса для уже существующих курсов)
+    пачками по batch_size строк. Каждая пачка - отдельная короткая транзакция, так что
+    другие соединения и процессы могут писать между пачками, а прерванная догрузка
+    продолжается с места остановки.
+    :param max_batches: Ограничение числа пачек за вызов (None - до конца).
+    :return: True, если отложенных догрузок не осталось.
+    """
+    with db_connection() as conn:
+        names = [row['name'] for row in conn.execute("SELECT name FROM schema_backfills ORDER BY name")
+                 if row['name'] in BACKFILLS]
+    batches = 0
+    for name in names:
+        while True:
+            if max_batches is not None and batches >= max_batches:
+                return False
+            batches += 1
+            if _backfill_step(name, batch_size):
+                break
+            time.sleep(BACKFILL_PAUSE)
+        _index_state.clear()
+        _bump_table_versions(BACKFILLS[name][1])
+    return True
 
 
 def hash_password_util(password): 
@@ -66,267 +697,800 @@ def add_user_db(username, password):
     """Добавляет нового пользователя в БД."""
     password_hash = hash_password_util(password)
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, password_hash))
-        conn.commit()
+        _run_write(lambda conn: conn.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, password_hash)), tables=('users',))
         return True
     except sqlite3.IntegrityError:
         
         
         return "integrity_error" 
     except sqlite3.Error as e:
-        messagebox.showerror("Ошибка БД", f"Не удалось зарегистрировать пользователя: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+        raise DatabaseError(f"Не удалось зарегистрировать пользователя: {e}") from e
 
 def check_user_credentials_db(username, password):
     """Проверяет учетные данные пользователя."""
     password_hash_to_check = hash_password_util(password)
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT password_hash FROM users WHERE username = ?", (username,))
-        result = cursor.fetchone()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT password_hash FROM users WHERE username = ?", (username,))
+            result = cursor.fetchone()
         if result and result['password_hash'] == password_hash_to_check:
             return True
         return False
     except sqlite3.Error as e:
-        messagebox.showerror("Ошибка БД", f"Ошибка при проверке учетных данных: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+        raise DatabaseError(f"Ошибка при проверке учетных данных: {e}") from e
 
 
 def add_course_db(title, description, instructor, level, youtube_link):
-    """Добавляет новый курс в БД."""
+    """Добавляет новый курс в БД; возвращает его course_id."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
+        return _run_write(lambda conn: conn.execute('''
         INSERT INTO courses (title, description, instructor_name, level, youtube_link)
         VALUES (?, ?, ?, ?, ?)
-        ''', (title, description, instructor, level, youtube_link))
-        conn.commit()
-        return True
+        ''', (title, description, instructor, level, youtube_link)).lastrowid, tables=('courses',))
     except sqlite3.Error as e:
-        messagebox.showerror("Ошибка БД", f"Не удалось добавить курс: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+        raise DatabaseError(f"Не удалось добавить курс: {e}") from e
 
-def get_all_courses_db(search_term=None, sort_by='title', sort_order='ASC'):
-    """Получает все курсы из БД с возможностью поиска и сортировки."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+def _courses_search_filter(search_term):
+    """Условие WHERE для поиска курсов: через FTS5, если он доступен, иначе LIKE."""
+    match_query = build_fts_query(search_term) if search_term and _fts_enabled() else None
+    if match_query:
+        return " WHERE course_id IN (SELECT rowid FROM courses_fts WHERE courses_fts MATCH ?)", [match_query]
+    if search_term:
+        like = f"%{search_term.strip()}%"
+        return " WHERE title LIKE ? OR description LIKE ? OR instructor_name LIKE ?", [like, like, like]
+    return "", []
+
+def _add_condition(where_sql, params, condition, condition_params):
+    """Добавляет к " WHERE ..." (возможно, пустому) еще одно условие через AND."""
+    if not condition:
+        return where_sql, params
+    if where_sql:
+        where_sql = f" WHERE ({where_sql[len(' WHERE '):]}) AND {condition}"
+    else:
+        where_sql = f" WHERE {condition}"
+    return where_sql, list(params) + list(condition_params)
+
+def _courses_listing_query(search_term=None, sort_by='title', sort_order='ASC', seek=None,
+                           columns=COURSE_LIST_COLUMNS):
+    """
+    Строит запрос списка курсов; возвращает (query, params).
+    seek - необязательное условие (sql, params) для выборки "после ключа".
+    columns - выбираемые столбцы: по умолчанию узкий набор для списка, COURSE_COLUMNS - все поля.
+    """
     valid_sort_columns = ['course_id', 'title', 'instructor_name', 'level']
     if sort_by not in valid_sort_columns:
         sort_by = 'title' 
     if sort_order.upper() not in ['ASC', 'DESC']:
         sort_order = 'ASC'
 
-    query = f"SELECT course_id, title, description, instructor_name, level, youtube_link FROM courses"
-    params = []
-    if search_term:
-        query += " WHERE title LIKE ?"
-        params.append(f"%{search_term}%")
+    where_sql, params = _courses_search_filter(search_term)
+    if seek:
+        where_sql, params = _add_condition(where_sql, params, *seek)
+    query = f"SELECT {columns} FROM courses{where_sql}"
     
     query += f" ORDER BY {sort_by} {sort_order.upper()}"
-    
-    cursor.execute(query, params)
-    courses = cursor.fetchall()
-    conn.close()
+    if sort_by != 'course_id':
+        query += f", course_id {sort_order.upper()}"
+    return query, params
+
+def _keyset_segments(columns, after, sort_order, nullable=False):
+    """
+    Условия выборки строк, идущих в порядке ORDER BY columns (все в направлении sort_order)
+    строго после ключа after. Возвращает список (sql, params), которые применяются по очереди,
+    пока не наберется страница.
+
+    Первый столбец ограничивается отдельно (col >= ?), чтобы SQLite начал просмотр индекса
+    прямо с нужного места, а весь ключ сравнивается как значение-строка. NULL в SQLite
+    меньше любого значения, но в сравнении дает NULL, поэтому для столбца, допускающего NULL,
+    строки с NULL выбираются отдельным условием (первыми при ASC и последними при DESC).
+    """
+    if after is None:
+        return [("", [])]
+    descending = sort_order.upper() == 'DESC'
+    op = '<' if descending else '>'
+    first, rest = columns[0], columns[1:]
+    if not rest:
+        return [(f"{first} {op} ?", [after[0]])]
+
+    rest_sql = f"({', '.join(rest)}) {op} ({', '.join('?' * len(rest))})"
+    if after[0] is None:
+        null_segment = (f"{first} IS NULL AND {rest_sql}", list(after[1:]))
+        return [null_segment] if descending else [null_segment, (f"{first} IS NOT NULL", [])]
+
+    key_sql = f"({', '.join(columns)}) {op} ({', '.join('?' * len(columns))})"
+    segments = [(f"{first} {op}= ? AND {key_sql}", [after[0]] + list(after))]
+    if descending and nullable:
+        segments.append((f"{first} IS NULL", []))
+    return segments
+
+def _fetch_keyset(build_query, key_columns, key_fields, after, sort_order, limit, nullable=False, offset=0):
+    """
+    Постраничная выборка по ключу (keyset): до limit строк после ключа after.
+    build_query(seek) возвращает (query, params) списка с дополнительным условием seek.
+    Без after выборка начинается со строки offset (переход в произвольное место списка).
+    Возвращает (rows, next_after); next_after - ключ последней строки для следующей
+    страницы или None, если строк больше нет.
+    """
+    rows = []
+    if after is not None:
+        offset = 0
+    with db_connection() as conn:
+        for seek in _keyset_segments(key_columns, after, sort_order, nullable):
+            query, params = build_query(seek)
+            rows.extend(conn.execute(query + " LIMIT ? OFFSET ?",
+                                     list(params) + [limit - len(rows), offset]).fetchall())
+            if len(rows) >= limit:
+                break
+    next_after = tuple(rows[-1][field] for field in key_fields) if rows and len(rows) >= limit else None
+    return rows, next_after
+
+def _iter_rows(query, params, batch_size):
+    """
+    Генератор строк запроса, читаемых порциями по batch_size через fetchmany.
+    Соединение из пула занято, пока генератор не исчерпан или не закрыт.
+    """
+    with db_connection() as conn:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+def _courses_key(sort_by):
+    """Столбцы ключа keyset-пагинации курсов и допускает ли первый из них NULL."""
+    if sort_by not in ('course_id', 'title', 'instructor_name', 'level'):
+        sort_by = 'title'
+    if sort_by == 'course_id':
+        return ('course_id',), False
+    return (sort_by, 'course_id'), sort_by in ('instructor_name', 'level')
+
+def get_all_courses_db(search_term=None, sort_by='title', sort_order='ASC'):
+    """Получает все курсы из БД с возможностью поиска и сортировки."""
+    query, params = _courses_listing_query(search_term, sort_by, sort_order)
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        courses = cursor.fetchall()
+    return courses
+
+@_cached_read('courses')
+def get_courses_after_db(limit, after=None, search_term=None, sort_by='title', sort_order='ASC', offset=0):
+    """
+    Получает до limit курсов, следующих за ключом after (keyset-пагинация).
+    Ключ - значения (sort_by, course_id) последней строки предыдущей страницы, и его
+    возвращает сама функция: результат - (courses, next_after), next_after=None на последней странице.
+    offset учитывается только без after - для перехода в произвольное место списка.
+    """
+    key_columns, nullable = _courses_key(sort_by)
+    return _fetch_keyset(
+        lambda seek: _courses_listing_query(search_term, key_columns[0], sort_order, seek),
+        key_columns, key_columns, after, sort_order, limit, nullable, offset
+    )
+
+def iter_courses_db(search_term=None, sort_by='title', sort_order='ASC', batch_size=STREAM_BATCH_SIZE):
+    """Потоково перебирает курсы со всеми полями (генератор), не загружая весь список в память."""
+    query, params = _courses_listing_query(search_term, sort_by, sort_order, columns=COURSE_COLUMNS)
+    return _iter_rows(query, params, batch_size)
+
+@_cached_read('courses')
+def get_course_db(course_id):
+    """Получает все поля одного курса (описание, ссылку) или None, если курса нет."""
+    with db_connection() as conn:
+        return conn.execute(f"SELECT {COURSE_COLUMNS} FROM courses WHERE course_id = ?", (course_id,)).fetchone()
+
+@_cached_read('courses')
+def count_courses_db(search_term=None):
+    """Возвращает число курсов (с учетом поискового запроса, если он задан)."""
+    where_sql, params = _courses_search_filter(search_term)
+    query = f"SELECT COUNT(*) FROM courses{where_sql}"
+    with db_connection() as conn:
+        return conn.execute(query, params).fetchone()[0]
+
+@_cached_read('courses')
+def search_courses_db(search_text, sort_by=None, sort_order='ASC', limit=SEARCH_RESULTS_LIMIT, offset=0):
+    """
+    Полнотекстовый поиск курсов по названию, описанию и преподавателю.
+    Без sort_by результаты упорядочены по релевантности (bm25). Кроме полей списка курсов
+    (COURSE_LIST_COLUMNS) каждая строка содержит title_highlight и description_snippet
+    с найденными словами в [скобках]; полное описание загружает get_course_db.
+    """
+    match_query = build_fts_query(search_text)
+    valid_sort_columns = ['course_id', 'title', 'instructor_name', 'level']
+    if sort_order.upper() not in ['ASC', 'DESC']:
+        sort_order = 'ASC'
+    if sort_by in valid_sort_columns:
+        order_sql = f"c.{sort_by} {sort_order.upper()}, c.course_id {sort_order.upper()}"
+    else:
+        order_sql = "rank, c.course_id"
+
+    if match_query and _fts_enabled():
+        weights = ", ".join(str(w) for w in FTS_RANK_WEIGHTS)
+        query = f'''
+        SELECT c.course_id, c.title, c.instructor_name, c.level, c.youtube_link <> '' AS has_youtube,
+               highlight(courses_fts, 0, '[', ']') AS title_highlight,
+               snippet(courses_fts, 1, '[', ']', '…', 12) AS description_snippet,
+               bm25(courses_fts, {weights}) AS rank
+        FROM courses_fts
+        JOIN courses c ON c.course_id = courses_fts.rowid
+        WHERE courses_fts MATCH ?
+        ORDER BY {order_sql}
+        LIMIT ? OFFSET ?
+        '''
+        params = [match_query, limit, offset]
+    else:
+        where_sql, params = _courses_search_filter(search_text)
+        query = f'''
+        SELECT c.course_id, c.title, c.instructor_name, c.level, c.youtube_link <> '' AS has_youtube,
+               c.title AS title_highlight, substr(c.description, 1, 120) AS description_snippet,
+               0 AS rank
+        FROM courses c{where_sql}
+        ORDER BY {order_sql if sort_by in valid_sort_columns else "c.title, c.course_id"}
+        LIMIT ? OFFSET ?
+        '''
+        params = params + [limit, offset]
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        courses = cursor.fetchall()
     return courses
 
 def update_course_db(course_id, title, description, instructor, level, youtube_link):
     """Обновляет данные курса в БД."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
+        _run_write(lambda conn: conn.execute('''
         UPDATE courses
         SET title = ?, description = ?, instructor_name = ?, level = ?, youtube_link = ?
         WHERE course_id = ?
-        ''', (title, description, instructor, level, youtube_link, course_id))
-        conn.commit()
+        ''', (title, description, instructor, level, youtube_link, course_id)), tables=('courses',))
         return True
     except sqlite3.Error as e:
-        messagebox.showerror("Ошибка БД", f"Не удалось обновить курс: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+        raise DatabaseError(f"Не удалось обновить курс: {e}") from e
 
 def delete_course_db(course_id):
     """Удаляет курс из БД."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM courses WHERE course_id = ?", (course_id,))
-        conn.commit()
+        _run_write(lambda conn: conn.execute("DELETE FROM courses WHERE course_id = ?", (course_id,)), tables=('courses', 'favorites'))
         return True
     except sqlite3.Error as e:
-        messagebox.showerror("Ошибка БД", f"Не удалось удалить курс: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+        raise DatabaseError(f"Не удалось удалить курс: {e}") from e
 
 
 def add_student_db(name, email):
-    """Добавляет нового студента в БД."""
+    """Добавляет нового студента в БД; возвращает его student_id или "integrity_error" для занятого email."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO students (name, email) VALUES (?, ?)", (name, email))
-        conn.commit()
-        return True
+        return _run_write(lambda conn: conn.execute("INSERT INTO students (name, email) VALUES (?, ?)", (name, email)).lastrowid, tables=('students',))
     except sqlite3.IntegrityError:
         
         return "integrity_error" 
     except sqlite3.Error as e:
-        messagebox.showerror("Ошибка БД", f"Не удалось добавить студента: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+        raise DatabaseError(f"Не удалось добавить студента: {e}") from e
 
-def get_all_students_db(sort_by='name', sort_order='ASC'):
-    """Получает всех студентов из БД с возможностью сортировки."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def _chunks(items, size=SQL_IN_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def add_students_batch_db(students):
+    """
+    Добавляет пачку студентов [(name, email), ...] одной транзакцией через executemany.
+    Строки с email, который уже есть в БД или повторяется в самой пачке, не вставляются.
+    Возвращает список индексов пропущенных строк-дубликатов; при ошибке - DatabaseError.
+    """
+    def work(conn):
+        existing = set()
+        for chunk in _chunks([email for _, email in students]):
+            placeholders = ", ".join("?" * len(chunk))
+            existing.update(row[0] for row in conn.execute(
+                f"SELECT email FROM students WHERE email IN ({placeholders})", chunk))
+        duplicates, rows = [], []
+        for index, (name, email) in enumerate(students):
+            if email in existing:
+                duplicates.append(index)
+            else:
+                existing.add(email)
+                rows.append((name, email))
+        conn.executemany("INSERT INTO students (name, email) VALUES (?, ?)", rows)
+        return duplicates
+
+    try:
+        return _run_write(work, tables=('students',))
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Не удалось добавить студентов: {e}") from e
+
+def add_courses_batch_db(courses):
+    """
+    Добавляет пачку курсов [(title, description, instructor, level, youtube_link), ...]
+    одной транзакцией через executemany. Возвращает True; при ошибке - DatabaseError.
+    """
+    try:
+        _run_write(lambda conn: conn.executemany('''
+        INSERT INTO courses (title, description, instructor_name, level, youtube_link)
+        VALUES (?, ?, ?, ?, ?)
+        ''', courses), tables=('courses',))
+        return True
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Не удалось добавить курсы: {e}") from e
+
+def _students_listing_query(sort_by='name', sort_order='ASC', seek=None):
+    """Строит запрос списка студентов; возвращает (query, params)."""
     valid_sort_columns = ['student_id', 'name', 'email']
     if sort_by not in valid_sort_columns:
         sort_by = 'name'
     if sort_order.upper() not in ['ASC', 'DESC']:
         sort_order = 'ASC'
         
-    query = f"SELECT student_id, name, email FROM students ORDER BY {sort_by} {sort_order.upper()}"
-    cursor.execute(query)
-    students = cursor.fetchall()
-    conn.close()
+    where_sql, params = _add_condition("", [], *(seek or ("", [])))
+    query = f"SELECT student_id, name, email FROM students{where_sql} ORDER BY {sort_by} {sort_order.upper()}"
+    if sort_by != 'student_id':
+        query += f", student_id {sort_order.upper()}"
+    return query, params
+
+def get_all_students_db(sort_by='name', sort_order='ASC'):
+    """Получает всех студентов из БД с возможностью сортировки."""
+    query, params = _students_listing_query(sort_by, sort_order)
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        students = cursor.fetchall()
     return students
 
+@_cached_read('students')
+def get_students_after_db(limit, after=None, sort_by='name', sort_order='ASC', offset=0):
+    """
+    Получает до limit студентов, следующих за ключом after (keyset-пагинация).
+    Возвращает (students, next_after), см. get_courses_after_db.
+    """
+    if sort_by not in ('student_id', 'name', 'email'):
+        sort_by = 'name'
+    key_columns = ('student_id',) if sort_by == 'student_id' else (sort_by, 'student_id')
+    return _fetch_keyset(
+        lambda seek: _students_listing_query(sort_by, sort_order, seek),
+        key_columns, key_columns, after, sort_order, limit, offset=offset
+    )
+
+def iter_students_db(sort_by='name', sort_order='ASC', batch_size=STREAM_BATCH_SIZE):
+    """Потоково перебирает студентов (генератор), не загружая весь список в память."""
+    query, params = _students_listing_query(sort_by, sort_order)
+    return _iter_rows(query, params, batch_size)
+
+@_cached_read('students')
+def count_students_db(search_term=None):
+    """Возвращает число студентов (с учетом поискового запроса, если он задан)."""
+    if search_term:
+        return len(_match_students(search_term))
+    with db_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+
+@_cached_read('students')
+def _match_students(search_text):
+    """
+    Студенты, похожие на search_text, лучшие первыми (не более SEARCH_RESULTS_LIMIT).
+    Первыми идут строки, где имя или email совпадает с запросом целиком, затем строки,
+    содержащие запрос как подстроку (фразовый MATCH по триграммному индексу) - чем
+    большую часть поля занимает запрос, тем выше, - затем нечеткие совпадения.
+    Нечеткие кандидаты ищутся, только если подстрок нашлось меньше лимита: запрос режется
+    на куски по STUDENT_SEARCH_PIECE символов (опечатка портит лишь несколько соседних),
+    по каждому куску читается не больше STUDENT_SEARCH_PIECE_ROWS строк индекса, и строка
+    набирает за него вес 1/(число прочитанных строк) - редкие куски весят больше частых,
+    а длинные списки частых не читаются целиком. Точно проверяются
+    STUDENT_SEARCH_CANDIDATES строк с наибольшим весом: остаются те, где нашлось не
+    меньше STUDENT_SEARCH_THRESHOLD триграмм запроса (text_trigrams); порядок - по
+    числу общих триграмм, затем по их доле среди всех триграмм запроса и строки.
+    Запрос короче трех символов триграммный индекс не ищет - для него выбираются
+    строки, где имя или email начинается с запроса.
+    """
+    query_trigrams = text_trigrams(search_text)
+    normalized = " ".join((search_text or "").casefold().split())
+    if not query_trigrams:
+        return []
+    with db_connection() as conn:
+        if not _index_ready('student_trigrams'):
+            like = f"%{search_text.strip()}%"
+            return conn.execute(
+                "SELECT student_id, name, email FROM students WHERE name LIKE ? OR email LIKE ? "
+                "ORDER BY name, student_id LIMIT ?", (like, like, SEARCH_RESULTS_LIMIT)).fetchall()
+        if len(normalized) < 3:
+            rows = {}
+            for column, prefix in (('name', normalized.title()), ('name', search_text.strip()), ('email', normalized)):
+                rows.update((row['student_id'], row) for row in conn.execute(
+                    f"SELECT student_id, name, email FROM students WHERE {column} >= ? AND {column} < ? "
+                    f"ORDER BY {column} LIMIT ?", (prefix, prefix + "\uffff", SEARCH_RESULTS_LIMIT)))
+            return sorted(rows.values(), key=lambda row: (row['name'], row['student_id']))[:SEARCH_RESULTS_LIMIT]
+
+        def match(text):
+            return '"{}"'.format(text.replace('"', '""'))
+
+        # Полные совпадения ищутся по индексам students: среди тысяч строк с той же
+        # подстрокой они могли бы не попасть в первые SEARCH_RESULTS_LIMIT.
+        rows = {row['student_id']: row for row in conn.execute(
+            "SELECT student_id, name, email FROM students WHERE email = ? OR name IN (?, ?) LIMIT ?",
+            (normalized, search_text.strip(), normalized.title(), SEARCH_RESULTS_LIMIT))}
+        substrings = conn.execute('''
+        SELECT s.student_id, s.name, s.email
+        FROM (SELECT rowid FROM student_trigrams WHERE student_trigrams MATCH ? LIMIT ?) m
+        JOIN students s ON s.student_id = m.rowid
+        ''', (match(normalized), SEARCH_RESULTS_LIMIT)).fetchall()
+        rows.update((row['student_id'], row) for row in substrings)
+
+        if len(substrings) < SEARCH_RESULTS_LIMIT:
+            piece_rows = f"SELECT rowid FROM student_trigrams WHERE student_trigrams MATCH ? LIMIT {STUDENT_SEARCH_PIECE_ROWS}"
+            weights = {}
+            found_rows = 0
+            for size in (STUDENT_SEARCH_PIECE, 3):
+                for piece in {normalized[i:i + size] for i in range(len(normalized) - size + 1)}:
+                    found = conn.execute(f"SELECT COUNT(*) FROM ({piece_rows})", (match(piece),)).fetchone()[0]
+                    if found:
+                        weights[match(piece)] = 1.0 / found
+                        found_rows += found
+                # В коротком слове опечатка может испортить все куски - тогда ищем и по триграммам.
+                if found_rows >= STUDENT_SEARCH_CANDIDATES:
+                    break
+            if weights:
+                # Веса суммируются в SQLite: строк индекса может быть тысячи.
+                union = " UNION ALL ".join(f"SELECT rowid, ? AS weight FROM ({piece_rows})" for _ in weights)
+                params = [value for piece, weight in weights.items() for value in (weight, piece)]
+                rows.update((row['student_id'], row) for row in conn.execute(f'''
+                SELECT s.student_id, s.name, s.email
+                FROM (SELECT rowid FROM ({union}) GROUP BY rowid ORDER BY SUM(weight) DESC LIMIT ?) m
+                JOIN students s ON s.student_id = m.rowid
+                ''', params + [STUDENT_SEARCH_CANDIDATES]))
+
+    ranked = []
+    for row in rows.values():
+        fields = [" ".join(value.casefold().split()) for value in (row['name'], row['email'])]
+        containing = [field for field in fields if normalized in field]
+        if containing:
+            group = 0 if normalized in fields else 1
+            score = (len(normalized) / min(map(len, containing)), 0)
+        else:
+            row_trigrams = text_trigrams(f"{row['name']} {row['email']}")
+            shared = len(query_trigrams & row_trigrams)
+            if shared < len(query_trigrams) * STUDENT_SEARCH_THRESHOLD:
+                continue
+            group = 2
+            score = (shared, shared / len(query_trigrams | row_trigrams))
+        ranked.append(((group, -score[0], -score[1], row['name'], row['student_id']), row))
+    ranked.sort(key=lambda item: item[0])
+    return [row for _, row in ranked[:SEARCH_RESULTS_LIMIT]]
+
+def search_students_db(search_text, limit=SEARCH_RESULTS_LIMIT, offset=0):
+    """
+    Нечеткий поиск студентов по имени и email по триграммному индексу: находит и
+    строки с опечатками ("ивонов" найдет "Иванов"). Возвращает limit строк, начиная
+    с offset, в порядке убывания сходства (см. _match_students).
+    """
+    return _match_students(search_text)[offset:offset + limit]
+
 def update_student_db(student_id, name, email):
     """Обновляет данные студента в БД."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE students SET name = ?, email = ? WHERE student_id = ?", (name, email, student_id))
-        conn.commit()
+        _run_write(lambda conn: conn.execute("UPDATE students SET name = ?, email = ? WHERE student_id = ?", (name, email, student_id)), tables=('students',))
         return True
     except sqlite3.IntegrityError:
         
         return "integrity_error"
     except sqlite3.Error as e:
-        messagebox.showerror("Ошибка БД", f"Не удалось обновить студента: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+        raise DatabaseError(f"Не удалось обновить студента: {e}") from e
 
 def delete_student_db(student_id):
     """Удаляет студента из БД."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM students WHERE student_id = ?", (student_id,))
-        conn.commit()
+        _run_write(lambda conn: conn.execute("DELETE FROM students WHERE student_id = ?", (student_id,)), tables=('students', 'favorites'))
         return True
     except sqlite3.Error as e:
-        messagebox.showerror("Ошибка БД", f"Не удалось удалить студента: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+        raise DatabaseError(f"Не удалось удалить студента: {e}") from e
 
 
 def add_or_update_favorite_db(student_id, course_id, is_favorite, likes):
     """Добавляет или обновляет запись в избранном."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-        INSERT OR REPLACE INTO favorites (student_id, course_id, is_favorite, likes)
+        _run_write(lambda conn: conn.execute('''
+        INSERT INTO favorites (student_id, course_id, is_favorite, likes)
         VALUES (?, ?, ?, ?)
-        ''', (student_id, course_id, is_favorite, likes))
-        conn.commit()
+        ON CONFLICT (student_id, course_id) DO UPDATE
+        SET is_favorite = excluded.is_favorite, likes = excluded.likes
+        ''', (student_id, course_id, is_favorite, likes)), tables=('favorites',))
         return True
     except sqlite3.Error as e:
-        messagebox.showerror("Ошибка БД", f"Не удалось добавить/обновить избранное: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+        raise DatabaseError(f"Не удалось добавить/обновить избранное: {e}") from e
             
+# Вставка записи избранного или обновление статуса существующей одним выражением;
+# лайки существующей записи не меняются, строка не удаляется и не вставляется заново.
+UPSERT_FAVORITE_STATUS_SQL = '''
+INSERT INTO favorites (student_id, course_id, is_favorite) VALUES (?, ?, ?)
+ON CONFLICT (student_id, course_id) DO UPDATE SET is_favorite = excluded.is_favorite
+'''
+
+def _count_existing_favorites(conn, pairs):
+    """Сколько из пар (student_id, course_id) уже есть в избранном."""
+    existing = 0
+    for chunk in _chunks(pairs):
+        values_sql = ", ".join("(?, ?)" for _ in chunk)
+        params = [value for pair in chunk for value in pair]
+        existing += conn.execute(f'''
+        WITH p(student_id, course_id) AS (VALUES {values_sql})
+        SELECT COUNT(*) FROM p JOIN favorites f
+            ON f.student_id = p.student_id AND f.course_id = p.course_id
+        ''', params).fetchone()[0]
+    return existing
+
+def set_favorites_status_db(pairs, is_favorite):
+    """
+    Добавляет в избранное или обновляет статус is_favorite для списка пар
+    (student_id, course_id) одной транзакцией (INSERT ... ON CONFLICT DO UPDATE).
+    Лайки существующих записей сохраняются.
+    Возвращает {'inserted': число новых записей, 'updated': число обновленных},
+    "integrity_error", если студента или курса уже нет; при другой ошибке - DatabaseError.
+    """
+    pairs = list(dict.fromkeys((student_id, course_id) for student_id, course_id in pairs))
+    if not pairs:
+        return {'inserted': 0, 'updated': 0}
+
+    def work(conn):
+        existing = _count_existing_favorites(conn, pairs)
+        conn.executemany(UPSERT_FAVORITE_STATUS_SQL,
+                         ((student_id, course_id, is_favorite) for student_id, course_id in pairs))
+        return {'inserted': len(pairs) - existing, 'updated': existing}
+
+    try:
+        return _run_write(work, tables=('favorites',))
+    except sqlite3.IntegrityError:
+        return "integrity_error"
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Не удалось добавить/обновить избранное: {e}") from e
+
 def update_favorite_likes_db(student_id, course_id, new_likes_count):
     """Обновляет количество лайков для записи в избранном."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
+        _run_write(lambda conn: conn.execute('''
         UPDATE favorites
         SET likes = ?
         WHERE student_id = ? AND course_id = ?
-        ''', (new_likes_count, student_id, course_id))
-        conn.commit()
+        ''', (new_likes_count, student_id, course_id)), tables=('favorites',))
         return True
     except sqlite3.Error as e:
-        messagebox.showerror("Ошибка БД", f"Не удалось обновить лайки: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+        raise DatabaseError(f"Не удалось обновить лайки: {e}") from e
 
-def get_all_favorites_db(sort_by_col_index=0, sort_order='ASC'):
-    """Получает все записи из избранного с возможностью сортировки."""
-    sort_map = {
-        0: "s.name",        
-        1: "c.title",       
-        2: "f.is_favorite", 
-        3: "f.likes"        
-    }
-    sort_column_sql = sort_map.get(sort_by_col_index, "s.name") 
+def _increment_likes(conn, deltas):
+    """Прибавляет приращения к лайкам в рамках текущей транзакции; возвращает новые значения."""
+    new_likes = {}
+    for (student_id, course_id), delta in deltas.items():
+        conn.execute('''
+        UPDATE favorites
+        SET likes = max(0, COALESCE(likes, 0) + ?)
+        WHERE student_id = ? AND course_id = ?
+        ''', (delta, student_id, course_id))
+        row = conn.execute("SELECT likes FROM favorites WHERE student_id = ? AND course_id = ?",
+                           (student_id, course_id)).fetchone()
+        if row is not None:
+            new_likes[(student_id, course_id)] = row['likes']
+    return new_likes
+
+def increment_favorite_likes_db(student_id, course_id, delta):
+    """
+    Атомарно изменяет лайки записи избранного на delta (likes = max(0, likes + delta)).
+    В отличие от update_favorite_likes_db не теряет одновременные лайки других пользователей.
+    Возвращает новое количество лайков или None, если записи нет.
+    """
+    return increment_favorite_likes_many_db({(student_id, course_id): delta}).get((student_id, course_id))
+
+def increment_favorite_likes_many_db(deltas):
+    """
+    Применяет приращения лайков {(student_id, course_id): delta} одной транзакцией.
+    Возвращает {(student_id, course_id): новое количество лайков} для найденных записей;
+    при ошибке - DatabaseError.
+    """
+    if not deltas:
+        return {}
+    try:
+        return _run_write(lambda conn: _increment_likes(conn, deltas), tables=('favorites',))
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Не удалось обновить лайки: {e}") from e
+
+# Для каждой сортировки: столбец, столбцы первичного ключа для однозначного порядка
+# и порядок соединения таблиц. Внешним циклом идет таблица, индекс которой уже
+# отсортирован по нужным столбцам (CROSS JOIN в SQLite фиксирует порядок),
+# поэтому временная сортировка не нужна.
+FAVORITES_SORT_MAP = {
+    0: ("s.name", ("s.student_id", "f.course_id"), """FROM students s
+    CROSS JOIN favorites f ON f.student_id = s.student_id
+    JOIN courses c ON f.course_id = c.course_id"""),
+    1: ("c.title", ("c.course_id", "f.student_id"), """FROM courses c
+    CROSS JOIN favorites f ON f.course_id = c.course_id
+    JOIN students s ON f.student_id = s.student_id"""),
+    2: ("f.is_favorite", ("f.student_id", "f.course_id"), """FROM favorites f
+    JOIN students s ON f.student_id = s.student_id
+    JOIN courses c ON f.course_id = c.course_id"""),
+    3: ("f.likes", ("f.student_id", "f.course_id"), """FROM favorites f
+    JOIN students s ON f.student_id = s.student_id
+    JOIN courses c ON f.course_id = c.course_id"""),
+}
+
+# Имена полей строки результата для столбцов ключа сортировки избранного
+FAVORITES_KEY_FIELDS = {"s.name": "student_name", "c.title": "course_title"}
+FAVORITES_NULLABLE_SORT_COLUMNS = ("f.is_favorite", "f.likes")
+
+def _favorites_listing_query(sort_by_col_index=0, sort_order='ASC', seek=None):
+    """Строит запрос списка избранного; возвращает (query, params)."""
+    sort_column_sql, tiebreak_columns, from_clause = FAVORITES_SORT_MAP.get(sort_by_col_index, FAVORITES_SORT_MAP[0])
     if sort_order.upper() not in ['ASC', 'DESC']:
         sort_order = 'ASC'
         
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    order_sql = ", ".join(f"{col} {sort_order.upper()}" for col in (sort_column_sql,) + tiebreak_columns)
+    where_sql, params = _add_condition("", [], *(seek or ("", [])))
     query = f'''
     SELECT s.name AS student_name, c.title AS course_title,
            f.is_favorite, f.likes, f.student_id, f.course_id
-    FROM favorites f
-    JOIN students s ON f.student_id = s.student_id
-    JOIN courses c ON f.course_id = c.course_id
-    ORDER BY {sort_column_sql} {sort_order.upper()}
+    {from_clause}{where_sql}
+    ORDER BY {order_sql}
     '''
-    cursor.execute(query)
-    favorites = cursor.fetchall()
-    conn.close()
+    return query, params
+
+def get_all_favorites_db(sort_by_col_index=0, sort_order='ASC'):
+    """Получает все записи из избранного с возможностью сортировки."""
+    query, params = _favorites_listing_query(sort_by_col_index, sort_order)
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        favorites = cursor.fetchall()
     return favorites
 
+@_cached_read('favorites', 'students', 'courses')
+def get_favorites_after_db(limit, after=None, sort_by_col_index=0, sort_order='ASC', offset=0):
+    """
+    Получает до limit записей избранного, следующих за ключом after (keyset-пагинация).
+    Возвращает (favorites, next_after), см. get_courses_after_db.
+    """
+    if sort_by_col_index not in FAVORITES_SORT_MAP:
+        sort_by_col_index = 0
+    sort_column_sql, tiebreak_columns, _ = FAVORITES_SORT_MAP[sort_by_col_index]
+    key_columns = (sort_column_sql,) + tiebreak_columns
+    key_fields = tuple(FAVORITES_KEY_FIELDS.get(col, col.split('.')[1]) for col in key_columns)
+    return _fetch_keyset(
+        lambda seek: _favorites_listing_query(sort_by_col_index, sort_order, seek),
+        key_columns, key_fields, after, sort_order, limit,
+        nullable=sort_column_sql in FAVORITES_NULLABLE_SORT_COLUMNS, offset=offset
+    )
+
+def iter_favorites_db(sort_by_col_index=0, sort_order='ASC', batch_size=STREAM_BATCH_SIZE):
+    """Потоково перебирает записи избранного (генератор), не загружая весь список в память."""
+    query, params = _favorites_listing_query(sort_by_col_index, sort_order)
+    return _iter_rows(query, params, batch_size)
+
+@_cached_read('favorites')
+def count_favorites_db():
+    """Возвращает число записей в избранном."""
+    with db_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM favorites").fetchone()[0]
+
 def delete_favorite_db(student_id, course_id):
     """Удаляет запись из избранного."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM favorites WHERE student_id = ? AND course_id = ?", (student_id, course_id))
-        conn.commit()
+        _run_write(lambda conn: conn.execute("DELETE FROM favorites WHERE student_id = ? AND course_id = ?", (student_id, course_id)), tables=('favorites',))
         return True
     except sqlite3.Error as e:
-        messagebox.showerror("Ошибка БД", f"Не удалось удалить из избранного: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+        raise DatabaseError(f"Не удалось удалить из избранного: {e}") from e
+
+def get_db_stats():
+    """
+    Сводка по БД для обслуживания: число строк в таблицах, размер файла и страниц,
+    свободные страницы, режим журнала и наличие FTS5-индекса.
+    Возвращает словарь; при ошибке - DatabaseError.
+    """
+    try:
+        with db_connection() as conn:
+            counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                      for table in _table_versions}
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            schema_version = conn.execute("PRAGMA user_version").fetchone()[0]
+            pending_backfills = [row[0] for row in conn.execute("SELECT name FROM schema_backfills")]
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Не удалось получить статистику БД: {e}") from e
+    return {
+        'db_name': DB_NAME,
+        'file_size': os.path.getsize(DB_NAME) if os.path.exists(DB_NAME) else 0,
+        'page_size': page_size,
+        'page_count': page_count,
+        'freelist_count': freelist_count,
+        'journal_mode': journal_mode,
+        'schema_version': schema_version,
+        'pending_backfills': ", ".join(pending_backfills) or None,
+        'fts_enabled': _fts_enabled(),
+        'student_trigrams_enabled': _index_ready('student_trigrams'),
+        'rows': counts,
+    }
+
+def vacuum_db():
+    """
+    Обслуживание БД: VACUUM (сжатие файла), ANALYZE (статистика для планировщика)
+    и слияние сегментов FTS5-индексов. Выполняется вне транзакции и блокирует БД
+    на время работы, поэтому предназначено для ночных пакетных заданий.
+    Возвращает словарь {'size_before', 'size_after', 'seconds'}; при ошибке - DatabaseError.
+    """
+    size_before = os.path.getsize(DB_NAME) if os.path.exists(DB_NAME) else 0
+    started = time.perf_counter()
+    try:
+        with db_connection() as conn:
+            for index_name in ('courses_fts', 'student_trigrams'):
+                if _index_ready(index_name):
+                    conn.execute(f"INSERT INTO {index_name} ({index_name}) VALUES ('optimize')")
+                    conn.commit()
+            conn.execute("VACUUM")
+            conn.execute("ANALYZE")
+            conn.commit()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Не удалось выполнить обслуживание БД: {e}") from e
+    return {
+        'size_before': size_before,
+        'size_after': os.path.getsize(DB_NAME),
+        'seconds': time.perf_counter() - started,
+    }
+
+def _seek_samples(key_columns, order, nullable):
+    """Условия keyset-выборки для проверки планов: после обычного ключа и после ключа с NULL."""
+    afters = [(1,) * len(key_columns)]
+    if nullable:
+        afters.append((None,) + (1,) * (len(key_columns) - 1))
+    for after in afters:
+        yield from _keyset_segments(key_columns, after, order, nullable)
+
+def _listing_queries():
+    """Перечисляет все варианты запросов списков: (название, query, params, отфильтрован ли)."""
+    for order in ('ASC', 'DESC'):
+        for column in ('course_id', 'title', 'instructor_name', 'level'):
+            yield (f"courses ORDER BY {column} {order}",) + _courses_listing_query(None, column, order) + (False,)
+            yield (f"courses search ORDER BY {column} {order}",) + _courses_listing_query("x", column, order) + (True,)
+            key_columns, nullable = _courses_key(column)
+            for seek in _seek_samples(key_columns, order, nullable):
+                yield (f"courses after key ORDER BY {column} {order} WHERE {seek[0]}",) + \
+                    _courses_listing_query(None, column, order, seek) + (False,)
+        for column in ('student_id', 'name', 'email'):
+            yield (f"students ORDER BY {column} {order}",) + _students_listing_query(column, order) + (False,)
+            key_columns = ('student_id',) if column == 'student_id' else (column, 'student_id')
+            for seek in _seek_samples(key_columns, order, False):
+                yield (f"students after key ORDER BY {column} {order}",) + \
+                    _students_listing_query(column, order, seek) + (False,)
+        for col_index, (column, tiebreak_columns, _) in FAVORITES_SORT_MAP.items():
+            yield (f"favorites ORDER BY {column} {order}",) + _favorites_listing_query(col_index, order) + (False,)
+            nullable = column in FAVORITES_NULLABLE_SORT_COLUMNS
+            for seek in _seek_samples((column,) + tiebreak_columns, order, nullable):
+                yield (f"favorites after key ORDER BY {column} {order} WHERE {seek[0]}",) + \
+                    _favorites_listing_query(col_index, order, seek) + (False,)
+
+def check_query_plans():
+    """
+    Прогоняет EXPLAIN QUERY PLAN для всех запросов списков и возвращает список проблем
+    в виде словарей {'query': ..., 'detail': ...}. Проблемой считается временная
+    сортировка (USE TEMP B-TREE), автоматический индекс, который SQLite строит на
+    время запроса, и полный просмотр таблицы без индекса во внутреннем цикле соединения.
+    Упорядоченный просмотр внешней таблицы (по индексу или по первичному ключу) для
+    полного списка неизбежен и проблемой не считается, как и сортировка небольшого
+    набора найденных строк в запросах с поиском.
+    """
+    problems = []
+    with db_connection() as conn:
+        for name, query, params, filtered in _listing_queries():
+            plan = conn.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()
+            loops = [row['detail'] for row in plan if row['detail'].startswith(('SCAN', 'SEARCH'))]
+            for row in plan:
+                detail = row['detail']
+                if 'AUTOMATIC' in detail or ('USE TEMP B-TREE' in detail and not filtered):
+                    problems.append({'query': name, 'detail': detail})
+                elif (detail.startswith('SCAN') and 'USING' not in detail and 'VIRTUAL TABLE' not in detail
+                        and loops and detail != loops[0]):
+                    problems.append({'query': name, 'detail': detail})
+    return problems
 
 if __name__ == '__main__':
     
     print("Инициализация базы данных...")
     init_db()
-    print("База данных готова (или уже существовала).")
\ No newline at end of file
+    print("База данных готова (или уже существовала).")
+    for problem in check_query_plans():
+        print(f"План запроса [{problem['query']}]: {problem['detail']}")
\ No newline at end of file
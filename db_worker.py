@@ -0,0 +1,263 @@
+import threading
+import queue
+from tkinter import messagebox
+import database_manager as db_manager
+
+
+def show_db_error(error, parent=None):
+    """
+    Показывает ошибку, возникшую при вызове database_manager, в диалоге.
+    Слой данных только выбрасывает исключения; диалоги показывает интерфейс.
+    """
+    if isinstance(error, db_manager.DatabaseError):
+        messagebox.showerror(error.title, str(error), parent=parent)
+    else:
+        messagebox.showerror("Ошибка БД", f"Ошибка при обращении к базе данных: {error}", parent=parent)
+
+
+class DbExecutor:
+    """
+    Выполняет вызовы database_manager в фоновом потоке, чтобы медленный запрос
+    или заблокированная БД не замораживали окно. Результаты возвращаются в главный
+    поток Tk через root.after(), поэтому колбэки могут свободно работать с виджетами.
+
+    Запросы с ключом (key) отменяемые: новый запрос с тем же ключом отменяет
+    предыдущий - если тот еще не начал выполняться, он пропускается, а если уже
+    выполняется, его результат отбрасывается. Запросы без ключа (запись) выполняются всегда.
+    Фоновые запросы (background=True, например догрузка индексов) не учитываются
+    в busy и on_busy_change: индикатор занятости показывает только запросы интерфейса.
+    """
+    POLL_INTERVAL_MS = 30
+
+    def __init__(self, root, on_busy_change=None):
+        """
+        :param root: Корневое окно Tkinter (для after()).
+        :param on_busy_change: Колбэк on_busy_change(busy: bool), вызывается в главном потоке,
+                               когда появляются первые или завершаются последние запросы.
+        """
+        self.root = root
+        self.on_busy_change = on_busy_change
+        self._tasks = queue.Queue()
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._generations = {}
+        self._epoch = 0
+        self._pending = 0
+        self._background = 0
+        self._busy = False
+        self._poll_id = None
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._worker_loop, name="db-worker", daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self):
+        return self._pending > 0
+
+    def submit(self, func, *args, key=None, on_success=None, on_error=None, background=False, **kwargs):
+        """
+        Ставит func(*args, **kwargs) в очередь фонового потока.
+        :param key: Ключ отменяемого запроса, например "courses.refresh".
+        :param on_success: Колбэк on_success(result) в главном потоке.
+        :param on_error: Колбэк on_error(exception) в главном потоке; по умолчанию ошибка
+                         показывается через show_db_error.
+        :param background: Не учитывать запрос в состоянии занятости (busy).
+        """
+        if self._closed:
+            return
+        with self._lock:
+            generation = None
+            if key is not None:
+                generation = self._generations.get(key, 0) + 1
+                self._generations[key] = generation
+            epoch = self._epoch
+        self._tasks.put((key, generation, epoch, func, args, kwargs, on_success, on_error, background))
+        if background:
+            self._background += 1
+        else:
+            self._pending += 1
+            self._set_busy(True)
+        self._schedule_poll()
+
+    def cancel(self, key):
+        """Отменяет последний запрос с данным ключом."""
+        with self._lock:
+            if key in self._generations:
+                self._generations[key] += 1
+
+    def cancel_all(self):
+        """Отменяет все отменяемые запросы и отбрасывает колбэки всех уже поставленных запросов."""
+        with self._lock:
+            self._epoch += 1
+            for key in self._generations:
+                self._generations[key] += 1
+
+    def _is_current(self, key, generation, epoch):
+        with self._lock:
+            if epoch != self._epoch and key is not None:
+                return False
+            return key is None or self._generations.get(key) == generation
+
+    def _worker_loop(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+            key, generation, epoch, func, args, kwargs, _, _, _ = task
+            if not self._is_current(key, generation, epoch):
+                self._results.put(("cancelled", task, None))
+                continue
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self._results.put(("error", task, e))
+            else:
+                self._results.put(("done", task, result))
+
+    def _schedule_poll(self):
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.POLL_INTERVAL_MS, self._poll_results)
+
+    def _poll_results(self):
+        """Забирает готовые результаты в главном потоке и вызывает колбэки."""
+        self._poll_id = None
+        try:
+            while True:
+                try:
+                    item = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                status, task, payload = item
+                if task[-1]:
+                    self._background -= 1
+                else:
+                    self._pending -= 1
+                self._deliver(status, task, payload)
+        finally:
+            if self._pending == 0:
+                self._set_busy(False)
+            if self._pending > 0 or self._background > 0 or not self._results.empty():
+                self._schedule_poll()
+
+    def _deliver(self, status, task, payload):
+        key, generation, epoch, _, _, _, on_success, on_error, _ = task
+        if status == "cancelled":
+            return
+        with self._lock:
+            if epoch != self._epoch:
+                return
+        if key is not None and not self._is_current(key, generation, epoch):
+            return
+        if status == "error":
+            if on_error:
+                on_error(payload)
+            else:
+                show_db_error(payload)
+        elif on_success:
+            on_success(payload)
+
+    def _set_busy(self, busy):
+        """Сообщает on_busy_change о смене состояния занятости (только при изменении)."""
+        if busy == self._busy:
+            return
+        self._busy = busy
+        if self.on_busy_change:
+            self.on_busy_change(busy)
+
+    def shutdown(self, wait=True):
+        """Останавливает фоновый поток; при wait=True дожидается выполнения уже поставленных запросов."""
+        if self._closed:
+            return
+        self._closed = True
+        self._tasks.put(None)
+        if wait:
+            self._thread.join()
+
+
+def run_in_thread(root, func, *args, on_success=None, on_error=None, poll_interval_ms=100, **kwargs):
+    """
+    Выполняет долгую операцию (например, экспорт) в отдельном потоке со своим
+    соединением из пула, чтобы она не занимала очередь DbExecutor: списки, выбор
+    записей и запись в БД продолжают работать, пока операция идет.
+    Колбэки on_success(result) и on_error(exception) вызываются в главном потоке Tk
+    (результат забирается опросом через root.after()); по умолчанию ошибка
+    показывается через show_db_error.
+    """
+    results = queue.Queue()
+
+    def work():
+        try:
+            results.put(("done", func(*args, **kwargs)))
+        except Exception as e:
+            results.put(("error", e))
+
+    def poll():
+        try:
+            status, payload = results.get_nowait()
+        except queue.Empty:
+            root.after(poll_interval_ms, poll)
+            return
+        if status == "error":
+            (on_error or show_db_error)(payload)
+        elif on_success:
+            on_success(payload)
+
+    thread = threading.Thread(target=work, name=f"db-task-{getattr(func, '__name__', 'task')}", daemon=True)
+    thread.start()
+    root.after(poll_interval_ms, poll)
+    return thread
+
+
+class WriteBehindBuffer:
+    """
+    Буфер отложенной записи: накапливает числовые приращения по ключу и записывает
+    их одной транзакцией через flush_func({key: сумма приращений}) в фоновом потоке
+    DbExecutor - через delay_ms после первого изменения или по явному flush().
+    Частые клики по одной записи превращаются в одно обращение к БД.
+    """
+    FLUSH_DELAY_MS = 500
+
+    def __init__(self, db_executor, flush_func, delay_ms=FLUSH_DELAY_MS, on_flushed=None, on_failed=None):
+        """
+        :param flush_func: Функция записи; выполняется в фоновом потоке.
+        :param on_flushed: Колбэк on_flushed(result) в главном потоке после успешной записи.
+        :param on_failed: Колбэк on_failed() в главном потоке, если запись не удалась
+                          (после показа ошибки).
+        """
+        self.db_executor = db_executor
+        self.flush_func = flush_func
+        self.delay_ms = delay_ms
+        self.on_flushed = on_flushed
+        self.on_failed = on_failed
+        self._pending = {}
+        self._timer_id = None
+
+    def add(self, key, delta):
+        """Добавляет приращение delta для ключа key."""
+        if not delta:
+            return
+        self._pending[key] = self._pending.get(key, 0) + delta
+        if self._timer_id is None:
+            self._timer_id = self.db_executor.root.after(self.delay_ms, self.flush)
+
+    def pending(self, key):
+        """Сумма еще не записанных приращений для key."""
+        return self._pending.get(key, 0)
+
+    def flush(self):
+        """Немедленно ставит в очередь запись всех накопленных приращений."""
+        if self._timer_id is not None:
+            self.db_executor.root.after_cancel(self._timer_id)
+            self._timer_id = None
+        batch = {key: delta for key, delta in self._pending.items() if delta}
+        self._pending = {}
+        if not batch:
+            return
+
+        def on_error(error):
+            show_db_error(error)
+            if self.on_failed:
+                self.on_failed()
+
+        self.db_executor.submit(self.flush_func, batch, on_success=self.on_flushed, on_error=on_error)
@@ -0,0 +1,113 @@
+"""
+Потоковый экспорт курсов, студентов и избранного в CSV или JSON Lines (при желании - gzip).
+
+Строки читаются из тех же запросов списков, что и в интерфейсе (database_manager.iter_*_db),
+порциями через fetchmany и сразу пишутся в файл, поэтому расход памяти не зависит
+от размера таблиц. Экспорт можно запускать из интерфейса или из командной строки:
+    python exporter.py courses courses.csv --search python --sort-by title
+    python exporter.py favorites favorites.jsonl.gz --sort-by likes --order DESC
+"""
+import argparse
+import csv
+import gzip
+import json
+import time
+from collections import namedtuple
+
+import database_manager as db_manager
+
+EXPORT_KINDS = ('courses', 'students', 'favorites')
+
+# Столбцы файла экспорта в порядке столбцов запросов списков
+EXPORT_COLUMNS = {
+    'courses': ('course_id', 'title', 'description', 'instructor_name', 'level', 'youtube_link'),
+    'students': ('student_id', 'name', 'email'),
+    'favorites': ('student_name', 'course_title', 'is_favorite', 'likes', 'student_id', 'course_id'),
+}
+
+# Столбцы сортировки избранного -> индекс сортировки database_manager.FAVORITES_SORT_MAP
+FAVORITES_SORT_COLUMNS = {'student_name': 0, 'course_title': 1, 'is_favorite': 2, 'likes': 3}
+
+ExportReport = namedtuple('ExportReport', 'rows seconds path')
+
+
+def detect_format(path):
+    """Формат по расширению (с учетом .gz): 'jsonl' для .jsonl/.ndjson/.json, иначе 'csv'."""
+    name = path.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return 'jsonl' if name.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def iter_export_rows(kind, search_term=None, sort_by=None, sort_order='ASC', batch_size=db_manager.STREAM_BATCH_SIZE):
+    """
+    Генератор строк для экспорта; поиск поддерживается только для курсов.
+    Сортировку избранного можно задать именем столбца или индексом, как в интерфейсе.
+    """
+    if kind == 'courses':
+        return db_manager.iter_courses_db(search_term, sort_by or 'title', sort_order, batch_size)
+    if kind == 'students':
+        return db_manager.iter_students_db(sort_by or 'name', sort_order, batch_size)
+    if kind == 'favorites':
+        sort_index = sort_by if isinstance(sort_by, int) else FAVORITES_SORT_COLUMNS.get(sort_by, 0)
+        return db_manager.iter_favorites_db(sort_index, sort_order, batch_size)
+    raise ValueError(f"Неизвестный вид данных для экспорта: {kind}")
+
+
+def _open_output(path, compress):
+    if compress:
+        return gzip.open(path, 'wt', newline='', encoding='utf-8')
+    return open(path, 'w', newline='', encoding='utf-8')
+
+
+def export_rows(kind, path, file_format=None, compress=None, search_term=None, sort_by=None, sort_order='ASC',
+                batch_size=db_manager.STREAM_BATCH_SIZE):
+    """
+    Экспортирует курсы, студентов или избранное в файл.
+    :param file_format: 'csv' или 'jsonl'; по умолчанию - по расширению файла.
+    :param compress: Сжимать ли gzip; по умолчанию - если имя файла оканчивается на .gz.
+    :return: ExportReport(rows, seconds, path).
+    """
+    file_format = file_format or detect_format(path)
+    if compress is None:
+        compress = path.lower().endswith('.gz')
+
+    started = time.perf_counter()
+    count = 0
+    rows = iter_export_rows(kind, search_term, sort_by, sort_order, batch_size)
+    columns = EXPORT_COLUMNS[kind]
+    with _open_output(path, compress) as f:
+        if file_format == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(tuple(row))
+                count += 1
+        else:
+            for row in rows:
+                f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n")
+                count += 1
+    return ExportReport(count, time.perf_counter() - started, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("kind", choices=EXPORT_KINDS)
+    parser.add_argument("path", help="выходной файл (.csv, .jsonl, можно с .gz)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="по умолчанию - по расширению файла")
+    parser.add_argument("--gzip", action="store_true", default=None, help="сжать gzip (по умолчанию - для .gz)")
+    parser.add_argument("--search", help="поисковый запрос (только для курсов)")
+    parser.add_argument("--sort-by", help="столбец сортировки")
+    parser.add_argument("--order", choices=("ASC", "DESC"), default="ASC")
+    parser.add_argument("--db", help="файл БД (по умолчанию online_school.db)")
+    args = parser.parse_args()
+
+    if args.db:
+        db_manager.DB_NAME = args.db
+    report = export_rows(args.kind, args.path, args.format, args.gzip, args.search, args.sort_by, args.order)
+    print(f"Экспортировано строк: {report.rows} в {report.path} за {report.seconds:.1f} с")
+    db_manager.close_pool()
+
+
+if __name__ == "__main__":
+    main()
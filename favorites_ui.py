@@ -3,6 +3,11 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import database_manager as db_manager 
+import db_worker
+from virtual_tree import VirtualTreeview
+from autocomplete import AutocompleteCombobox
+import exporter
+from utils import ask_export_path, show_export_result, IdLabelIndex
 
 class FavoritesUI:
     def __init__(self, parent_notebook, app_instance):
@@ -35,10 +40,16 @@ class FavoritesUI:
         
         self.tree_all_columns = self.tree_display_columns + ("student_id", "course_id")
 
+        
+        self.likes_buffer = db_worker.WriteBehindBuffer(
+            self.app_instance.db_executor, db_manager.increment_favorite_likes_many_db,
+            on_flushed=self._on_likes_flushed, on_failed=self.refresh_favorites_list
+        )
+
 
         self._setup_widgets()
         self.populate_comboboxes() 
-        self.refresh_favorites_list()
+        self._apply_query()
 
     def _setup_widgets(self):
         
@@ -47,13 +58,17 @@ class FavoritesUI:
 
         ttk.Label(add_update_frame, text="Студент*:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
         self.student_var = tk.StringVar()
-        self.student_combo = ttk.Combobox(add_update_frame, textvariable=self.student_var, state="readonly", width=38)
-        self.student_combo.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+        self.student_selector = AutocompleteCombobox(add_update_frame, self.app_instance.student_index,
+                                                     self.student_var, width=38)
+        self.student_selector.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+        self.student_combo = self.student_selector.combo
 
         ttk.Label(add_update_frame, text="Курс*:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
         self.course_var = tk.StringVar()
-        self.course_combo = ttk.Combobox(add_update_frame, textvariable=self.course_var, state="readonly", width=38)
-        self.course_combo.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
+        self.course_selector = AutocompleteCombobox(add_update_frame, self.app_instance.course_index,
+                                                    self.course_var, width=38)
+        self.course_selector.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
+        self.course_combo = self.course_selector.combo
 
         self.is_favorite_var = tk.BooleanVar(value=False) 
         fav_check_frame = ttk.Frame(add_update_frame)
@@ -72,7 +87,13 @@ class FavoritesUI:
         list_likes_frame = ttk.LabelFrame(self.frame, text="Список избранного и управление лайками")
         list_likes_frame.pack(padx=10, pady=10, fill="both", expand=True)
 
-        self.favorites_tree = ttk.Treeview(list_likes_frame, columns=self.tree_all_columns, show="headings")
+        self.favorites_list = VirtualTreeview(
+            list_likes_frame, self.tree_all_columns,
+            fetch_page=self._fetch_favorites_page, count_rows=self._count_favorites,
+            row_to_item=self._favorite_to_item, db_executor=self.app_instance.db_executor,
+            key="favorites"
+        )
+        self.favorites_tree = self.favorites_list.tree
 
         for i, col_id in enumerate(self.tree_display_columns): 
             text = self.tree_column_display_texts[col_id]
@@ -89,13 +110,9 @@ class FavoritesUI:
         self.favorites_tree.column("student_id", width=0, stretch=tk.NO, minwidth=0) 
         self.favorites_tree.column("course_id", width=0, stretch=tk.NO, minwidth=0)
 
-        self.favorites_tree.pack(side=tk.LEFT, padx=5, pady=5, fill="both", expand=True)
+        self.favorites_list.pack(side=tk.LEFT, padx=5, pady=5, fill="both", expand=True)
         self.favorites_tree.bind("<<TreeviewSelect>>", self.on_tree_select)
 
-        fav_tree_scrollbar_y = ttk.Scrollbar(list_likes_frame, orient="vertical", command=self.favorites_tree.yview)
-        fav_tree_scrollbar_y.pack(side=tk.LEFT, fill='y')
-        self.favorites_tree.configure(yscrollcommand=fav_tree_scrollbar_y.set)
-
         
         likes_control_frame = ttk.Frame(list_likes_frame)
         likes_control_frame.pack(side=tk.LEFT, padx=10, fill="y", anchor="n")
@@ -111,6 +128,7 @@ class FavoritesUI:
         bottom_button_frame = ttk.Frame(self.frame)
         bottom_button_frame.pack(pady=5, fill="x", padx=10)
         ttk.Button(bottom_button_frame, text="Обновить весь список", command=self.refresh_favorites_list).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(bottom_button_frame, text="Экспорт...", command=self.export_favorites).pack(side=tk.RIGHT, padx=5)
 
     def _sort_by_column(self, column_idx):
         """Обрабатывает клик по заголовку для сортировки."""
@@ -119,123 +137,120 @@ class FavoritesUI:
         else:
             self.sort_column_idx = column_idx
             self.sort_order_asc = True
-        self.refresh_favorites_list()
+        self._apply_query()
 
     def populate_comboboxes(self):
-        """Заполняет комбобоксы студентов и курсов."""
-        
-        
-        
-        
-        current_student_selection = self.student_var.get()
-        current_course_selection = self.course_var.get()
-
-        student_names = [""] + sorted(list(self.app_instance.student_name_to_id.keys()))
-        self.student_combo['values'] = student_names
-        if current_student_selection in student_names:
-            self.student_combo.set(current_student_selection)
-        elif student_names:
-            self.student_combo.current(0)
-
-        course_titles = [""] + sorted(list(self.app_instance.course_title_to_id.keys()))
-        self.course_combo['values'] = course_titles
-        if current_course_selection in course_titles:
-            self.course_combo.set(current_course_selection)
-        elif course_titles:
-            self.course_combo.current(0)
+        """
+        Обновляет подсказки полей выбора студента и курса после изменения индексов ID.
+        Полные списки в Combobox не загружаются - только совпадения с введенным текстом.
+        """
+        self.student_selector.refresh()
+        self.course_selector.refresh()
 
     def add_or_update_favorite_status(self):
         """Добавляет новую запись в избранное или обновляет статус is_favorite существующей."""
-        student_name_selected = self.student_var.get()
-        course_title_selected = self.course_var.get()
+        student_name_selected = self.student_var.get().strip()
+        course_title_selected = self.course_var.get().strip()
 
         if not student_name_selected or not course_title_selected or student_name_selected == "" or course_title_selected == "":
             messagebox.showerror("Ошибка валидации", "Необходимо выбрать студента и курс.", parent=self.frame)
             return
 
-        student_id = self.app_instance.student_name_to_id.get(student_name_selected)
-        course_id = self.app_instance.course_title_to_id.get(course_title_selected)
+        student_id = self.student_selector.selected_id()
+        course_id = self.course_selector.selected_id()
 
         if student_id is None or course_id is None:
-            messagebox.showerror("Ошибка", "Не удалось определить ID студента или курса.\nВозможно, списки устарели. Обновите их на соответствующих вкладках.", parent=self.frame)
+            messagebox.showerror("Ошибка", "Не удалось определить ID студента или курса.\nВыберите значение из списка подсказок; если его там нет, обновите списки на соответствующих вкладках.", parent=self.frame)
             return
             
         is_favorite_val = self.is_favorite_var.get()
         
-        current_likes = 0 
-        conn = db_manager.get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT likes FROM favorites WHERE student_id = ? AND course_id = ?", (student_id, course_id))
-        existing_fav = cursor.fetchone()
-        conn.close()
+        def on_saved(result):
+            if result == "integrity_error":
+                messagebox.showerror("Ошибка", "Студент или курс уже удален.\nОбновите списки на соответствующих вкладках.", parent=self.frame)
+            elif result:
+                action = "статус обновлен" if result['updated'] else "добавлена"
+                messagebox.showinfo("Успех", f"Запись в избранном {action}.", parent=self.frame)
+                self.refresh_favorites_list()
+                
+                self.is_favorite_var.set(False) 
+
+        self.app_instance.db_executor.submit(
+            db_manager.set_favorites_status_db, [(student_id, course_id)], is_favorite_val,
+            on_success=on_saved
+        )
         
-        if existing_fav:
-            current_likes = existing_fav['likes'] 
 
-        if db_manager.add_or_update_favorite_db(student_id, course_id, is_favorite_val, current_likes):
-            action = "статус обновлен" if existing_fav else "добавлена"
-            messagebox.showinfo("Успех", f"Запись в избранном {action}.", parent=self.frame)
-            self.refresh_favorites_list()
-            
-            self.is_favorite_var.set(False) 
-        
+    @staticmethod
+    def _fetch_favorites_page(offset, limit, after=None, sort_by_col_index=0, sort_order='ASC'):
+        """Загружает страницу избранного (выполняется в фоновом потоке); возвращает (строки, ключ)."""
+        return db_manager.get_favorites_after_db(limit, after, sort_by_col_index=sort_by_col_index,
+                                                 sort_order=sort_order, offset=offset)
+
+    @staticmethod
+    def _count_favorites(**query):
+        return db_manager.count_favorites_db()
+
+    @staticmethod
+    def _favorite_to_item(fav_row):
+        is_fav_display = "Да" if fav_row['is_favorite'] else "Нет"
+        values = (
+            fav_row['student_name'], fav_row['course_title'], 
+            is_fav_display, fav_row['likes'],
+            fav_row['student_id'], fav_row['course_id'] 
+        )
+        return f"{fav_row['student_id']}:{fav_row['course_id']}", values
 
-    def refresh_favorites_list(self):
-        """Обновляет список избранного в Treeview."""
-        for i in self.favorites_tree.get_children():
-            self.favorites_tree.delete(i)
-        
-        sort_order_str = "ASC" if self.sort_order_asc else "DESC"
-        favorites_data = db_manager.get_all_favorites_db(
-            sort_by_col_index=self.sort_column_idx, 
-            sort_order=sort_order_str
+    def _apply_query(self):
+        """Передает списку текущую сортировку; список строится заново с начала."""
+        self.favorites_list.set_query(
+            sort_by_col_index=self.sort_column_idx,
+            sort_order="ASC" if self.sort_order_asc else "DESC"
         )
-        for fav_row in favorites_data:
-            is_fav_display = "Да" if fav_row['is_favorite'] else "Нет"
-            values_to_insert = (
-                fav_row['student_name'], fav_row['course_title'], 
-                is_fav_display, fav_row['likes'],
-                fav_row['student_id'], fav_row['course_id'] 
+
+    def refresh_favorites_list(self):
+        """Перечитывает список избранного из БД (в фоновом потоке), сохраняя положение прокрутки."""
+        # Накопленные лайки записываются раньше, чем список будет перечитан.
+        self.likes_buffer.flush()
+        self.favorites_list.refresh()
+
+    def export_favorites(self):
+        """Экспортирует избранное (с текущей сортировкой) в файл в фоновом потоке."""
+        path = ask_export_path(self.frame, "favorites.csv")
+        if not path:
+            return
+        on_success, on_error = show_export_result(self.frame)
+
+        def start_export(_=None):
+            db_worker.run_in_thread(
+                self.frame, exporter.export_rows, "favorites", path,
+                sort_by=self.sort_column_idx, sort_order="ASC" if self.sort_order_asc else "DESC",
+                on_success=on_success, on_error=on_error
             )
-            self.favorites_tree.insert("", "end", values=values_to_insert)
-        
-        
-        self.selected_fav_student_id = None 
-        self.selected_fav_course_id = None
+
+        # Экспорт идет в своем потоке; он начинается, когда очередь DbExecutor дойдет
+        # до пустого запроса после записи накопленных лайков.
+        self.likes_buffer.flush()
+        self.app_instance.db_executor.submit(lambda: None, on_success=start_export)
 
     def on_tree_select(self, event):
         """Обрабатывает выбор строки в Treeview (для лайков и удаления)."""
         selected_item_iid = self.favorites_tree.focus()
         if not selected_item_iid:
-            self.selected_fav_student_id = None
-            self.selected_fav_course_id = None
+            
             return
 
-        item_values = self.favorites_tree.item(selected_item_iid, 'values')
-        if item_values and len(item_values) == len(self.tree_all_columns):
-            student_id_idx = self.tree_all_columns.index("student_id")
-            course_id_idx = self.tree_all_columns.index("course_id")
-            self.selected_fav_student_id = item_values[student_id_idx]
-            self.selected_fav_course_id = item_values[course_id_idx]
+        fav_row = self.favorites_list.row(selected_item_iid)
+        if fav_row:
+            self.selected_fav_student_id = fav_row['student_id']
+            self.selected_fav_course_id = fav_row['course_id']
             
             
             
-            student_name_display = ""
-            for name, sid in self.app_instance.student_name_to_id.items():
-                if sid == self.selected_fav_student_id:
-                    student_name_display = name
-                    break
-            self.student_var.set(student_name_display)
-
-            course_title_display = ""
-            for title, cid in self.app_instance.course_title_to_id.items():
-                if cid == self.selected_fav_course_id:
-                    course_title_display = title
-                    break
-            self.course_var.set(course_title_display)
+            self.student_selector.set_id(self.selected_fav_student_id)
+            self.course_selector.set_id(self.selected_fav_course_id)
             
-            is_fav_idx = self.tree_all_columns.index("is_favorite")
-            self.is_favorite_var.set(item_values[is_fav_idx] == "Да")
+            self.is_favorite_var.set(bool(fav_row['is_favorite']))
 
         else:
             self.selected_fav_student_id = None
@@ -243,29 +258,48 @@ class FavoritesUI:
 
 
     def change_likes(self, amount):
-        """Изменяет количество лайков для выбранной записи."""
+        """
+        Изменяет количество лайков для выбранной записи. Значение в списке меняется сразу,
+        а приращения копятся в likes_buffer и записываются в БД одной транзакцией.
+        """
         if self.selected_fav_student_id is None or self.selected_fav_course_id is None:
             messagebox.showwarning("Лайки", "Сначала выберите запись в списке избранного.", parent=self.frame)
             return
 
-        current_likes = 0
-        selected_item_iid = self.favorites_tree.focus()
-        if selected_item_iid:
-            item_values = self.favorites_tree.item(selected_item_iid)['values']
-            likes_idx = self.tree_all_columns.index("likes")
-            if item_values and len(item_values) > likes_idx:
-                try:
-                    current_likes = int(item_values[likes_idx])
-                except (ValueError, TypeError):
-                    pass 
-        
-        new_likes = max(0, current_likes + amount)
+        pair = (self.selected_fav_student_id, self.selected_fav_course_id)
+        selected_item_iid = f"{pair[0]}:{pair[1]}"
+        fav_row = self.favorites_list.row(selected_item_iid)
+        if fav_row:
+            current_likes = fav_row['likes'] or 0
+            new_likes = max(0, current_likes + amount)
+            delta = new_likes - current_likes
+            self._show_likes(selected_item_iid, fav_row, new_likes)
+        else:
+            # Строки нет на экране: ограничение снизу нулем выполнит сама БД.
+            delta = amount
+
+        self.likes_buffer.add(pair, delta)
+
+    def _show_likes(self, iid, fav_row, likes):
+        new_row = {key: fav_row[key] for key in fav_row.keys()}
+        new_row['likes'] = likes
+        self.favorites_list.replace_row(iid, new_row)
 
-        if db_manager.update_favorite_likes_db(self.selected_fav_student_id, self.selected_fav_course_id, new_likes):
-            if selected_item_iid: 
-                current_row_values = list(self.favorites_tree.item(selected_item_iid, 'values'))
-                current_row_values[likes_idx] = new_likes
-                self.favorites_tree.item(selected_item_iid, values=tuple(current_row_values))
+    def _on_likes_flushed(self, new_likes_by_pair):
+        """Показывает значения лайков из БД (с учетом лайков других пользователей)."""
+        if not self.frame.winfo_exists():
+            return
+        for pair, likes in new_likes_by_pair.items():
+            if self.likes_buffer.pending(pair):
+                continue
+            iid = f"{pair[0]}:{pair[1]}"
+            fav_row = self.favorites_list.row(iid)
+            if fav_row and fav_row['likes'] != likes:
+                self._show_likes(iid, fav_row, likes)
+
+    def flush_pending_likes(self):
+        """Записывает накопленные лайки (при выходе из аккаунта и закрытии окна)."""
+        self.likes_buffer.flush()
         
 
     def delete_favorite(self):
@@ -275,23 +309,22 @@ class FavoritesUI:
             return
 
         if messagebox.askyesno("Подтверждение", "Вы уверены, что хотите удалить эту запись из избранного?", parent=self.frame):
-            if db_manager.delete_favorite_db(self.selected_fav_student_id, self.selected_fav_course_id):
-                messagebox.showinfo("Успех", "Запись из избранного успешно удалена.", parent=self.frame)
-                self.refresh_favorites_list() 
-                self.clear_add_form_fields() 
+            def on_deleted(deleted):
+                if deleted:
+                    messagebox.showinfo("Успех", "Запись из избранного успешно удалена.", parent=self.frame)
+                    self.refresh_favorites_list() 
+                    self.clear_add_form_fields() 
+
+            self.app_instance.db_executor.submit(
+                db_manager.delete_favorite_db, self.selected_fav_student_id, self.selected_fav_course_id,
+                on_success=on_deleted
+            )
             
 
     def clear_add_form_fields(self):
         """Очищает поля формы добавления/обновления статуса избранного."""
-        if self.student_combo['values']: 
-            try: self.student_combo.current(0) 
-            except tk.TclError: self.student_var.set("")
-        else: self.student_var.set("")
-        
-        if self.course_combo['values']:
-            try: self.course_combo.current(0)
-            except tk.TclError: self.course_var.set("")
-        else: self.course_var.set("")
+        self.student_selector.clear()
+        self.course_selector.clear()
         self.is_favorite_var.set(False)
         
         
@@ -308,8 +341,9 @@ if __name__ == '__main__':
     
     class MockApp:
         def __init__(self):
-            self.student_name_to_id = {} 
-            self.course_title_to_id = {} 
+            self.student_index = IdLabelIndex()
+            self.course_index = IdLabelIndex()
+            self.db_executor = db_worker.DbExecutor(root_test)
             self._populate_mock_data()
 
         def _populate_mock_data(self):
@@ -321,15 +355,8 @@ if __name__ == '__main__':
                 db_manager.add_course_db("Тест Курс A", "Описание А", "Лектор А", "Начальный", "")
                 db_manager.add_course_db("Тест Курс B", "Описание Б", "Лектор Б", "Средний", "")
 
-            students = db_manager.get_all_students_db()
-            for s in students:
-                name_display = f"{s['name']} (ID: {s['student_id']})"
-                self.student_name_to_id[name_display] = s['student_id']
-
-            courses = db_manager.get_all_courses_db()
-            for c in courses:
-                title_display = f"{c['title']} (ID: {c['course_id']})"
-                self.course_title_to_id[title_display] = c['course_id']
+            self.student_index.rebuild((s['student_id'], s['name'], s['email']) for s in db_manager.get_all_students_db())
+            self.course_index.rebuild((c['course_id'], c['title']) for c in db_manager.get_all_courses_db())
         
         
         def populate_all_favorites_comboboxes(self):
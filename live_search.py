@@ -0,0 +1,49 @@
+class LiveSearch:
+    """
+    Поиск при вводе для поля ttk.Entry: search() вызывается через delay_ms после
+    последнего нажатия клавиши, если текст поля отличается от уже выполненного
+    запроса (current_term()) и в нем не меньше min_chars символов; пустое поле
+    возвращает полный список. Загрузка списка (VirtualTreeview) идет с ключом
+    в DbExecutor, поэтому новый запрос отменяет еще не выполненный предыдущий,
+    а результат устаревшего отбрасывается; первая страница уже выполненного
+    запроса (например, после Backspace) берется из кэша списка сразу.
+    Поиск по Enter или кнопке вызывает cancel(), чтобы отложенный запрос не
+    выполнился повторно.
+    """
+    DEBOUNCE_MS = 300   # пауза после последнего нажатия клавиши перед поиском
+    MIN_CHARS = 2       # поиск при вводе начинается с этого числа символов
+
+    def __init__(self, entry, search, current_term, delay_ms=DEBOUNCE_MS, min_chars=MIN_CHARS):
+        """
+        :param entry: ttk.Entry с текстом запроса.
+        :param search: Функция без аргументов, выполняющая поиск по тексту поля.
+        :param current_term: Функция, возвращающая выполненный запрос (None - весь список).
+        """
+        self.entry = entry
+        self.search = search
+        self.current_term = current_term
+        self.delay_ms = delay_ms
+        self.min_chars = min_chars
+        self._after_id = None
+
+        self.entry.bind("<KeyRelease>", self._on_key_release)
+
+    def cancel(self):
+        """Отменяет отложенный поиск."""
+        if self._after_id is not None:
+            self.entry.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _on_key_release(self, event):
+        if event.keysym in ("Return", "Tab", "Escape"):
+            return
+        self.cancel()
+        self._after_id = self.entry.after(self.delay_ms, self._search_if_changed)
+
+    def _search_if_changed(self):
+        self._after_id = None
+        text = self.entry.get().strip()
+        if text and len(text) < self.min_chars:
+            return
+        if (text or None) != (self.current_term() or None):
+            self.search()
@@ -1,51 +1,91 @@
 
 
+import logging
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox
 import database_manager as db_manager
+import db_worker
 import auth_ui
 import courses_ui
 import students_ui
 import favorites_ui
+from utils import IdLabelIndex
+
+logger = logging.getLogger(__name__)
 
 
 class OnlineSchoolApp:
+    # Вкладки главного окна: (заголовок, класс вкладки, атрибут приложения для ее экземпляра).
+    # Вкладка строится и загружает данные только при первом переходе на нее.
+    TABS = (
+        ("Курсы", courses_ui.CoursesUI, 'courses_tab_instance'),
+        ("Студенты", students_ui.StudentsUI, 'students_tab_instance'),
+        ("Избранное и Лайки", favorites_ui.FavoritesUI, 'favorites_tab_instance'),
+    )
+
     def __init__(self, root):
         self.root = root
         self.root.title("Онлайн Школа") 
         
 
         
-        db_manager.init_db()
+        # Миграции схемы выполняются сразу, а догрузка данных для новых структур
+        # (например, FTS-индекса) идет в фоне небольшими порциями.
+        db_manager.init_db(backfill=False)
 
         self.current_user = None
         self.main_app_frame = None 
         self.notebook = None
+        self.busy_label = None
+        self.busy_progress = None
 
         
         
-        self.student_name_to_id = {} 
-        self.course_title_to_id = {}
+        # Общие индексы ID <-> подпись студентов и курсов для вкладки "Избранное".
+        self.student_index = IdLabelIndex()
+        self.course_index = IdLabelIndex()
+        self._id_map_callbacks = []
+        self._id_maps_version = None # версии таблиц students и courses, по которым построены индексы
 
         
         self.courses_tab_instance = None
         self.students_tab_instance = None
         self.favorites_tab_instance = None
+        self._tab_placeholders = {}     # заглушка еще не построенной вкладки -> индекс в TABS
+        self._interactive_timer = None  # (что измеряется, время начала) до первого завершения запросов
+
+        # Исполнитель создается после всех полей: первый же запрос вызывает _on_db_busy_change.
+        self.db_executor = db_worker.DbExecutor(self.root, on_busy_change=self._on_db_busy_change)
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        self._run_backfills()
 
         
         auth_callbacks = {'on_login_success': self._on_login_success}
-        self.auth_interface = auth_ui.AuthUI(self.root, auth_callbacks)
+        self.auth_interface = auth_ui.AuthUI(self.root, auth_callbacks, self.db_executor)
+
+    def _run_backfills(self, done=False):
+        """
+        Выполняет отложенные догрузки БД по одной пачке за запрос: между пачками
+        фоновый поток успевает выполнить запросы интерфейса. Пачки - фоновые запросы,
+        они не включают индикатор занятости и не влияют на замер готовности окна.
+        """
+        if not done:
+            self.db_executor.submit(db_manager.run_backfills, max_batches=1, on_success=self._run_backfills,
+                                    background=True)
 
     def _on_login_success(self, username):
         """Колбэк, вызываемый AuthUI после успешного входа."""
         self.current_user = username
         messagebox.showinfo("Успешный вход", f"Добро пожаловать, {username}!", parent=self.root)
+        login_started = time.perf_counter()
         
         
         if hasattr(self.auth_interface, 'clear_auth_frames'):
             self.auth_interface.clear_auth_frames()
             
         self._setup_main_application_ui()
+        self._interactive_timer = ("Вход", login_started)
 
     def _setup_main_application_ui(self):
         """Настраивает основной интерфейс приложения после входа."""
@@ -60,25 +100,90 @@ class OnlineSchoolApp:
         status_bar_frame.pack(side=tk.BOTTOM, fill=tk.X)
         ttk.Label(status_bar_frame, text=f"Пользователь: {self.current_user}").pack(side=tk.LEFT, padx=5)
         ttk.Button(status_bar_frame, text="Выход", command=self._logout).pack(side=tk.RIGHT, padx=5)
+        
+        self.busy_progress = ttk.Progressbar(status_bar_frame, mode="indeterminate", length=100)
+        self.busy_label = ttk.Label(status_bar_frame, text="")
+        self._on_db_busy_change(self.db_executor.busy)
 
         self.notebook = ttk.Notebook(self.main_app_frame)
 
-        
-        self.courses_tab_instance = courses_ui.CoursesUI(self.notebook, self)
-        self.students_tab_instance = students_ui.StudentsUI(self.notebook, self)
-        self.favorites_tab_instance = favorites_ui.FavoritesUI(self.notebook, self) 
+        # Сначала в блокноте только заглушки; вкладка строится при первом выборе.
+        self._tab_placeholders = {}
+        for index, (text, _, _) in enumerate(self.TABS):
+            placeholder = ttk.Frame(self.notebook)
+            self.notebook.add(placeholder, text=text)
+            self._tab_placeholders[str(placeholder)] = index
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
 
         self.notebook.pack(expand=1, fill='both', padx=5, pady=5)
+        self._build_tab(self.notebook.select())
 
-        
-        self._update_student_id_map()
-        self._update_course_id_map()
-        
-        self.populate_all_favorites_comboboxes()
+    def _on_tab_changed(self, event):
+        if self.notebook is not None and self.notebook.select() in self._tab_placeholders:
+            started = time.perf_counter()
+            text = self._build_tab(self.notebook.select())
+            if self._interactive_timer is None:
+                self._interactive_timer = (f"Вкладка '{text}'", started)
+
+    def _build_tab(self, placeholder):
+        """
+        Строит вкладку вместо заглушки placeholder (путь виджета) и делает ее текущей.
+        Конструктор вкладки сам добавляет свою рамку в конец блокнота, поэтому она
+        переносится на место заглушки, а заглушка убирается.
+        """
+        index = self._tab_placeholders.pop(placeholder)
+        text, tab_class, attribute = self.TABS[index]
+        started = time.perf_counter()
+        tab = tab_class(self.notebook, self)
+        setattr(self, attribute, tab)
+        position = self.notebook.index(placeholder)
+        self.notebook.insert(position, tab.frame)
+        self.notebook.select(tab.frame)
+        self.notebook.forget(placeholder)
+        logger.info("Вкладка '%s' построена за %.0f мс", text, (time.perf_counter() - started) * 1000)
 
+        if tab is self.favorites_tab_instance:
+            self.populate_all_favorites_comboboxes()
+        return text
+
+
+    def _on_db_busy_change(self, busy):
+        """Показывает или прячет индикатор выполнения запросов в строке состояния."""
+        if not busy and self._interactive_timer is not None:
+            # Все запросы, поставленные при входе или построении вкладки, выполнены:
+            # данные на экране, окно готово к работе.
+            what, started = self._interactive_timer
+            self._interactive_timer = None
+            logger.info("%s: окно готово к работе через %.0f мс", what, (time.perf_counter() - started) * 1000)
+        if not self.busy_label or not self.busy_label.winfo_exists():
+            return
+        if busy:
+            self.busy_label.config(text="Выполняется запрос к БД...")
+            self.busy_label.pack(side=tk.LEFT, padx=5)
+            self.busy_progress.pack(side=tk.LEFT, padx=5)
+            self.busy_progress.start(10)
+        else:
+            self.busy_progress.stop()
+            self.busy_progress.pack_forget()
+            self.busy_label.pack_forget()
+
+    def _on_close(self):
+        """Дожидается уже поставленных запросов к БД и закрывает окно."""
+        if self.favorites_tab_instance:
+            self.favorites_tab_instance.flush_pending_likes()
+        self.db_executor.cancel_all()
+        self.db_executor.shutdown(wait=True)
+        db_manager.close_pool()
+        self.root.destroy()
 
     def _logout(self):
         """Обрабатывает выход пользователя."""
+        
+        if self.favorites_tab_instance:
+            self.favorites_tab_instance.flush_pending_likes()
+        self.db_executor.cancel_all()
+        # cancel_all отбрасывает и колбэк догрузки - цепочка запускается заново.
+        self._run_backfills()
         self.current_user = None
         if self.main_app_frame and self.main_app_frame.winfo_exists():
             self.main_app_frame.destroy()
@@ -88,41 +193,94 @@ class OnlineSchoolApp:
         self.courses_tab_instance = None
         self.students_tab_instance = None
         self.favorites_tab_instance = None
+        self._tab_placeholders = {}
+        self._interactive_timer = None
         self.notebook = None 
+        self.busy_label = None
+        self.busy_progress = None
 
         
-        self.student_name_to_id.clear()
-        self.course_title_to_id.clear()
+        self.student_index.clear()
+        self.course_index.clear()
+        self._id_map_callbacks = []
+        self._id_maps_version = None
 
         
         auth_callbacks = {'on_login_success': self._on_login_success}
-        self.auth_interface = auth_ui.AuthUI(self.root, auth_callbacks)
+        self.auth_interface = auth_ui.AuthUI(self.root, auth_callbacks, self.db_executor)
 
     
 
-    def _update_student_id_map(self):
-        """Обновляет словарь self.student_name_to_id."""
-        self.student_name_to_id.clear()
-        students = db_manager.get_all_students_db() 
-        for s in students:
-            name_display = f"{s['name']} (ID: {s['student_id']})"
-            self.student_name_to_id[name_display] = s['student_id']
-
-    def _update_course_id_map(self):
-        """Обновляет словарь self.course_title_to_id."""
-        self.course_title_to_id.clear()
-        courses = db_manager.get_all_courses_db() 
-        for c in courses:
-            title_display = f"{c['title']} (ID: {c['course_id']})"
-            self.course_title_to_id[title_display] = c['course_id']
+    def _id_maps_outdated(self):
+        """Проверяет, менялись ли студенты или курсы с момента построения индексов ID."""
+        return db_manager.get_table_versions('students', 'courses') != self._id_maps_version
+
+    def _reload_id_maps(self, then=None):
+        """
+        Перечитывает студентов и курсы в фоновом потоке, перестраивает индексы ID
+        и затем вызывает then() в главном потоке. Повторный вызов отменяет еще не
+        завершенную загрузку, но колбэки всех вызовов выполняются после новой.
+        """
+        if then and then not in self._id_map_callbacks:
+            self._id_map_callbacks.append(then)
+
+        def fetch_rows():
+            # Версия читается до запросов: запись, попавшая между ними, вызовет повторную загрузку.
+            version = db_manager.get_table_versions('students', 'courses')
+            # Индексы (с сортировкой ключей поиска) строятся здесь же, в фоновом потоке.
+            student_index, course_index = IdLabelIndex(), IdLabelIndex()
+            student_index.rebuild((s['student_id'], s['name'], s['email']) for s in db_manager.get_all_students_db())
+            course_index.rebuild((c['course_id'], c['title']) for c in db_manager.get_all_courses_db())
+            return version, student_index, course_index
+
+        def on_loaded(rows):
+            version, student_index, course_index = rows
+            self.student_index.replace_with(student_index)
+            self.course_index.replace_with(course_index)
+            self._id_maps_version = version
+            callbacks, self._id_map_callbacks = self._id_map_callbacks, []
+            for callback in callbacks:
+                callback()
+
+        self.db_executor.submit(fetch_rows, key="app.id_maps", on_success=on_loaded)
+
+    def submit_id_change(self, func, *args, apply_change, on_success=None):
+        """
+        Выполняет в фоновом потоке запись о студенте или курсе func(*args) и точечно
+        обновляет индексы ID: apply_change(result) вызывается в главном потоке, если
+        запись изменила таблицы, а индексы были актуальны до нее. Иначе индексы будут
+        перечитаны целиком при следующем обращении, как и раньше.
+        :param on_success: Колбэк on_success(result) после записи.
+        """
+        def write():
+            # Записи приложения выполняются только в этом фоновом потоке, поэтому
+            # между двумя чтениями версий таблицы меняет лишь сама func.
+            before = db_manager.get_table_versions('students', 'courses')
+            result = func(*args)
+            return result, before, db_manager.get_table_versions('students', 'courses')
+
+        def on_written(outcome):
+            result, before, after = outcome
+            if after != before and before == self._id_maps_version:
+                apply_change(result)
+                self._id_maps_version = after
+                self._populate_favorites_comboboxes()
+            if on_success:
+                on_success(result)
+
+        self.db_executor.submit(write, on_success=on_written)
 
     def populate_all_favorites_comboboxes(self):
         """
         Вызывается из CoursesUI и StudentsUI после обновления их списков,
-        чтобы обновить комбобоксы на вкладке FavoritesUI.
+        чтобы обновить комбобоксы на вкладке FavoritesUI. Индексы ID и комбобоксы
+        перестраиваются, только если студенты или курсы действительно изменились.
+        Пока вкладка "Избранное" не построена, индексы не нужны и не загружаются.
         """
-        self._update_student_id_map() 
-        self._update_course_id_map()
+        if self.favorites_tab_instance and self._id_maps_outdated():
+            self._reload_id_maps(then=self._populate_favorites_comboboxes)
+
+    def _populate_favorites_comboboxes(self):
         if self.favorites_tab_instance:
             self.favorites_tab_instance.populate_comboboxes()
 
@@ -131,15 +289,22 @@ class OnlineSchoolApp:
         Вызывается, когда нужно полностью обновить данные на вкладке "Избранное"
         (например, после удаления студента или курса).
         """
-        
-        self._update_student_id_map()
-        self._update_course_id_map()
+        if not self.favorites_tab_instance:
+            return
+        if self._id_maps_outdated():
+            self._reload_id_maps(then=self._refresh_favorites_tab)
+        elif self.favorites_tab_instance:
+            self.favorites_tab_instance.refresh_favorites_list()
+
+    def _refresh_favorites_tab(self):
         if self.favorites_tab_instance:
+            self.favorites_tab_instance.populate_comboboxes()
             self.favorites_tab_instance.refresh_favorites_list() 
 
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s: %(message)s")
     root_tk = tk.Tk()
     app = OnlineSchoolApp(root_tk)
     root_tk.mainloop()
\ No newline at end of file
@@ -1,7 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import database_manager as db_manager 
-from utils import validate_email 
+import db_worker
+from virtual_tree import VirtualTreeview
+from live_search import LiveSearch
+import exporter
+from utils import validate_email, ask_export_path, show_export_result
 
 class StudentsUI:
     def __init__(self, parent_notebook, app_instance):
@@ -18,6 +22,7 @@ class StudentsUI:
         
         self.sort_column = 'name' 
         self.sort_order_asc = True
+        self.current_search_term = None
         self.selected_student_id = None
 
         
@@ -30,7 +35,7 @@ class StudentsUI:
         self.tree_columns_ordered = ("id", "name", "email")
 
         self._setup_widgets()
-        self.refresh_students_list()
+        self._apply_query()
 
     def _setup_widgets(self):
         
@@ -56,9 +61,26 @@ class StudentsUI:
         ttk.Button(button_frame, text="Удалить", command=self.delete_student).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Очистить поля", command=self.clear_input_fields).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Обновить список", command=self.refresh_students_list).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(button_frame, text="Экспорт...", command=self.export_students).pack(side=tk.RIGHT, padx=5)
+
+        search_frame = ttk.Frame(self.frame)
+        search_frame.pack(pady=5, fill="x", padx=10)
+        ttk.Label(search_frame, text="Поиск (имя, email, с опечатками):").pack(side=tk.LEFT, padx=5)
+        self.search_entry = ttk.Entry(search_frame, width=30)
+        self.search_entry.pack(side=tk.LEFT, padx=5)
+        self.live_search = LiveSearch(self.search_entry, self.perform_search, lambda: self.current_search_term)
+        self.search_entry.bind("<Return>", lambda e: self.perform_search())
+        ttk.Button(search_frame, text="Найти", command=self.perform_search).pack(side=tk.LEFT, padx=5)
+        ttk.Button(search_frame, text="Показать все", command=self.show_all).pack(side=tk.LEFT, padx=5)
 
         
-        self.students_tree = ttk.Treeview(self.frame, columns=self.tree_columns_ordered, show="headings")
+        self.students_list = VirtualTreeview(
+            self.frame, self.tree_columns_ordered,
+            fetch_page=self._fetch_students_page, count_rows=self._count_students,
+            row_to_item=self._student_to_item, db_executor=self.app_instance.db_executor,
+            key="students", data_version=lambda: db_manager.get_table_versions('students')
+        )
+        self.students_tree = self.students_list.tree
         
         for col_id in self.tree_columns_ordered:
             text = col_id.replace("_", " ").title()
@@ -71,14 +93,9 @@ class StudentsUI:
         self.students_tree.column("name", width=200)
         self.students_tree.column("email", width=250)
 
-        self.students_tree.pack(padx=10, pady=10, fill="both", expand=True)
+        self.students_list.pack(padx=10, pady=10, fill="both", expand=True)
         self.students_tree.bind("<<TreeviewSelect>>", self.on_tree_select)
 
-        
-        tree_scrollbar_y = ttk.Scrollbar(self.students_tree, orient="vertical", command=self.students_tree.yview)
-        tree_scrollbar_y.pack(side='right', fill='y')
-        self.students_tree.configure(yscrollcommand=tree_scrollbar_y.set)
-
     def _sort_by_column(self, column_name_db):
         """Обрабатывает клик по заголовку для сортировки."""
         if self.sort_column == column_name_db:
@@ -86,27 +103,43 @@ class StudentsUI:
         else:
             self.sort_column = column_name_db
             self.sort_order_asc = True
-        self.refresh_students_list()
+        self._apply_query()
 
-    def refresh_students_list(self):
-        """Обновляет список студентов в Treeview."""
-        for i in self.students_tree.get_children():
-            self.students_tree.delete(i)
-        
-        sort_order_str = "ASC" if self.sort_order_asc else "DESC"
-        students_data = db_manager.get_all_students_db(
+    @staticmethod
+    def _fetch_students_page(offset, limit, after=None, search_term=None, sort_by='name', sort_order='ASC'):
+        """
+        Загружает страницу студентов (выполняется в фоновом потоке); возвращает (строки, ключ).
+        Результаты поиска упорядочены по сходству с запросом, сортировка к ним не применяется.
+        """
+        if search_term:
+            return db_manager.search_students_db(search_term, limit=limit, offset=offset), None
+        return db_manager.get_students_after_db(limit, after, sort_by=sort_by or 'name', sort_order=sort_order,
+                                                offset=offset)
+
+    @staticmethod
+    def _count_students(search_term=None, **query):
+        return db_manager.count_students_db(search_term)
+
+    @staticmethod
+    def _student_to_item(student):
+        values = (
+            student['student_id'],
+            student['name'],
+            student['email']
+        )
+        return str(student['student_id']), values
+
+    def _apply_query(self):
+        """Передает списку текущие сортировку и поиск; список строится заново с начала."""
+        self.students_list.set_query(
+            search_term=self.current_search_term,
             sort_by=self.sort_column,
-            sort_order=sort_order_str
+            sort_order="ASC" if self.sort_order_asc else "DESC"
         )
-        
-        for student in students_data:
-            values_to_insert = (
-                student['student_id'],
-                student['name'],
-                student['email']
-            )
-            self.students_tree.insert("", "end", values=values_to_insert)
-            
+
+    def refresh_students_list(self):
+        """Перечитывает список студентов из БД (в фоновом потоке), сохраняя положение прокрутки."""
+        self.students_list.refresh()
         
         if hasattr(self.app_instance, 'populate_all_favorites_comboboxes'):
              self.app_instance.populate_all_favorites_comboboxes()
@@ -121,13 +154,19 @@ class StudentsUI:
         if not validate_email(email): 
             return
 
-        add_result = db_manager.add_student_db(name, email)
-        if add_result == True:
-            messagebox.showinfo("Успех", "Студент успешно добавлен.", parent=self.frame)
-            self.refresh_students_list()
-            self.clear_input_fields()
-        elif add_result == "integrity_error":
-            messagebox.showerror("Ошибка валидации", "Студент с таким Email уже существует.", parent=self.frame)
+        def on_added(add_result):
+            if add_result == "integrity_error":
+                messagebox.showerror("Ошибка валидации", "Студент с таким Email уже существует.", parent=self.frame)
+            elif add_result:
+                messagebox.showinfo("Успех", "Студент успешно добавлен.", parent=self.frame)
+                self.refresh_students_list()
+                self.clear_input_fields()
+
+        self.app_instance.submit_id_change(
+            db_manager.add_student_db, name, email,
+            apply_change=lambda student_id: self.app_instance.student_index.set(student_id, name, email),
+            on_success=on_added
+        )
         
 
     def update_student(self):
@@ -144,17 +183,24 @@ class StudentsUI:
         if not validate_email(email):
             return
 
-        update_result = db_manager.update_student_db(self.selected_student_id, name, email)
-        if update_result == True:
-            messagebox.showinfo("Успех", "Данные студента успешно обновлены.", parent=self.frame)
-            self.refresh_students_list()
-            
-            if hasattr(self.app_instance, 'refresh_favorites_tab_data'):
-                self.app_instance.refresh_favorites_tab_data()
-            self.clear_input_fields()
-            self.selected_student_id = None
-        elif update_result == "integrity_error":
-             messagebox.showerror("Ошибка валидации", "Студент с таким Email уже существует (возможно, вы пытаетесь присвоить email другого студента).", parent=self.frame)
+        def on_updated(update_result):
+            if update_result == True:
+                messagebox.showinfo("Успех", "Данные студента успешно обновлены.", parent=self.frame)
+                self.refresh_students_list()
+                
+                if hasattr(self.app_instance, 'refresh_favorites_tab_data'):
+                    self.app_instance.refresh_favorites_tab_data()
+                self.clear_input_fields()
+                self.selected_student_id = None
+            elif update_result == "integrity_error":
+                 messagebox.showerror("Ошибка валидации", "Студент с таким Email уже существует (возможно, вы пытаетесь присвоить email другого студента).", parent=self.frame)
+
+        student_id = self.selected_student_id
+        self.app_instance.submit_id_change(
+            db_manager.update_student_db, student_id, name, email,
+            apply_change=lambda _: self.app_instance.student_index.set(student_id, name, email),
+            on_success=on_updated
+        )
         
 
     def delete_student(self):
@@ -163,14 +209,22 @@ class StudentsUI:
             return
 
         if messagebox.askyesno("Подтверждение", "Вы уверены, что хотите удалить этого студента?\nЭто также удалит все связанные записи в 'Избранном'.", parent=self.frame):
-            if db_manager.delete_student_db(self.selected_student_id):
-                messagebox.showinfo("Успех", "Студент успешно удален.", parent=self.frame)
-                self.refresh_students_list()
-                
-                if hasattr(self.app_instance, 'refresh_favorites_tab_data'):
-                    self.app_instance.refresh_favorites_tab_data()
-                self.clear_input_fields()
-                self.selected_student_id = None
+            def on_deleted(deleted):
+                if deleted:
+                    messagebox.showinfo("Успех", "Студент успешно удален.", parent=self.frame)
+                    self.refresh_students_list()
+                    
+                    if hasattr(self.app_instance, 'refresh_favorites_tab_data'):
+                        self.app_instance.refresh_favorites_tab_data()
+                    self.clear_input_fields()
+                    self.selected_student_id = None
+
+            student_id = self.selected_student_id
+            self.app_instance.submit_id_change(
+                db_manager.delete_student_db, student_id,
+                apply_change=lambda _: self.app_instance.student_index.remove(student_id),
+                on_success=on_deleted
+            )
             
 
     def clear_input_fields(self):
@@ -180,22 +234,44 @@ class StudentsUI:
         if self.students_tree.focus(): 
             self.students_tree.selection_remove(self.students_tree.focus())
 
+    def perform_search(self):
+        self.live_search.cancel()
+        self.current_search_term = self.search_entry.get().strip() or None
+        self._apply_query()
+
+    def show_all(self):
+        self.live_search.cancel()
+        self.current_search_term = None
+        self.search_entry.delete(0, tk.END)
+        self._apply_query()
+
+    def export_students(self):
+        """Экспортирует студентов (с текущей сортировкой) в файл в фоновом потоке."""
+        path = ask_export_path(self.frame, "students.csv")
+        if not path:
+            return
+        on_success, on_error = show_export_result(self.frame)
+        db_worker.run_in_thread(
+            self.frame, exporter.export_rows, "students", path,
+            sort_by=self.sort_column, sort_order="ASC" if self.sort_order_asc else "DESC",
+            on_success=on_success, on_error=on_error
+        )
+
     def on_tree_select(self, event):
         selected_item_iid = self.students_tree.focus()
         if not selected_item_iid:
-            self.selected_student_id = None
+            
             return
 
-        item_values = self.students_tree.item(selected_item_iid, 'values')
-        if item_values:
-            col_order = self.tree_columns_ordered
-            self.selected_student_id = item_values[col_order.index("id")]
+        student = self.students_list.row(selected_item_iid)
+        if student and student['student_id'] != self.selected_student_id:
+            self.selected_student_id = student['student_id']
             
             self.name_entry.delete(0, tk.END)
-            self.name_entry.insert(0, item_values[col_order.index("name")])
+            self.name_entry.insert(0, student['name'])
             
             self.email_entry.delete(0, tk.END)
-            self.email_entry.insert(0, item_values[col_order.index("email")])
+            self.email_entry.insert(0, student['email'])
 
 if __name__ == '__main__':
     
@@ -206,10 +282,14 @@ if __name__ == '__main__':
     db_manager.init_db() 
 
     class MockApp: 
+        def __init__(self):
+            self.db_executor = db_worker.DbExecutor(root_test)
         def populate_all_favorites_comboboxes(self):
             print("MockApp: populate_all_favorites_comboboxes called for students")
         def refresh_favorites_tab_data(self):
             print("MockApp: refresh_favorites_tab_data called for students")
+        def submit_id_change(self, func, *args, apply_change, on_success=None):
+            self.db_executor.submit(func, *args, on_success=on_success)
 
     mock_app_instance = MockApp()
 
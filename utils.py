@@ -1,13 +1,29 @@
+import bisect
 import re
-from tkinter import messagebox
+
+# tkinter импортируется внутри функций с диалогами: проверки is_valid_* и константы
+# используются и без интерфейса (bulk_import.py, cli.py).
+
+COURSE_LEVELS = ("Начальный", "Средний", "Продвинутый")
+
+EMAIL_PATTERN = re.compile(r"[^@]+@[^@]+\.[^@]+")
+
+def is_valid_email(email_string):
+    """Проверяет строку на соответствие базовому формату email (без сообщений пользователю)."""
+    return bool(EMAIL_PATTERN.match(email_string))
+
+def is_valid_youtube_link(link_string):
+    """Проверяет ссылку на YouTube (пустая ссылка допустима) без сообщений пользователю."""
+    return not link_string or "youtube.com/" in link_string or "youtu.be/" in link_string
 
 def validate_email(email_string):
     """
     Проверяет строку на соответствие базовому формату email.
     Возвращает True, если валидно, иначе False и показывает messagebox.
     """
-    if re.match(r"[^@]+@[^@]+\.[^@]+", email_string):
+    if is_valid_email(email_string):
         return True
+    from tkinter import messagebox
     messagebox.showerror("Ошибка валидации", "Некорректный формат Email.")
     return False
 
@@ -16,13 +32,144 @@ def validate_youtube_link(link_string):
     Проверяет, что ссылка на YouTube (если указана) содержит 'youtube.com/' или 'youtu.be/'.
     Возвращает True, если валидно или пусто, иначе False и показывает messagebox.
     """
-    if not link_string: 
-        return True
-    if "youtube.com/" in link_string or "youtu.be/" in link_string:
+    if is_valid_youtube_link(link_string):
         return True
+    from tkinter import messagebox
     messagebox.showerror("Ошибка валидации", "Ссылка на YouTube должна содержать 'youtube.com/' или 'youtu.be/'.")
     return False
 
+def ask_export_path(parent, initial_file):
+    """Спрашивает у пользователя файл для экспорта; возвращает путь или пустую строку."""
+    from tkinter import filedialog
+    return filedialog.asksaveasfilename(
+        parent=parent, title="Экспорт", initialfile=initial_file, defaultextension=".csv",
+        filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"),
+                   ("CSV (gzip)", "*.csv.gz"), ("JSON Lines (gzip)", "*.jsonl.gz"), ("Все файлы", "*.*")]
+    )
+
+def show_export_result(parent):
+    """Колбэки (on_success, on_error) для экспорта, запущенного через db_worker.run_in_thread."""
+    from tkinter import messagebox
+
+    def on_success(report):
+        messagebox.showinfo("Экспорт", f"Экспортировано строк: {report.rows}\nФайл: {report.path}", parent=parent)
+
+    def on_error(error):
+        messagebox.showerror("Ошибка экспорта", f"Не удалось выполнить экспорт: {error}", parent=parent)
+
+    return on_success, on_error
+
+class IdLabelIndex:
+    """
+    Двусторонний индекс ID <-> подпись для комбобоксов вида "Имя (ID: 5)".
+    Поиск в обе стороны - O(1); ID всегда приводятся к int, поэтому строковые
+    ID из значений Treeview находятся так же, как числовые из БД.
+    Для подсказок при вводе хранится отсортированный список ключей поиска
+    (подпись, каждое ее слово и дополнительные термины, например email):
+    search() находит совпадения по префиксу через bisect без перебора всех записей.
+    """
+
+    def __init__(self):
+        self._label_by_id = {}
+        self._id_by_label = {}
+        self._keys_by_id = {}
+        self._search_keys = []   # отсортированные пары (ключ поиска, id)
+
+    @staticmethod
+    def make_label(entity_id, text):
+        return f"{text} (ID: {entity_id})"
+
+    @staticmethod
+    def _make_search_keys(text, search_terms):
+        text = str(text).casefold()
+        keys = {text}
+        keys.update(text.split())
+        keys.update(str(term).casefold() for term in search_terms if term)
+        return keys
+
+    def rebuild(self, items):
+        """Заполняет индекс заново из кортежей (id, текст, *дополнительные термины поиска)."""
+        self._label_by_id.clear()
+        self._id_by_label.clear()
+        self._keys_by_id.clear()
+        for entity_id, text, *search_terms in items:
+            entity_id = int(entity_id)
+            label = self.make_label(entity_id, text)
+            self._label_by_id[entity_id] = label
+            self._id_by_label[label] = entity_id
+            self._keys_by_id[entity_id] = self._make_search_keys(text, search_terms)
+        self._search_keys = sorted((key, entity_id) for entity_id, keys in self._keys_by_id.items() for key in keys)
+
+    def set(self, entity_id, text, *search_terms):
+        """Добавляет запись или меняет ее подпись."""
+        entity_id = int(entity_id)
+        self.remove(entity_id)
+        label = self.make_label(entity_id, text)
+        self._label_by_id[entity_id] = label
+        self._id_by_label[label] = entity_id
+        keys = self._make_search_keys(text, search_terms)
+        self._keys_by_id[entity_id] = keys
+        for key in keys:
+            bisect.insort(self._search_keys, (key, entity_id))
+
+    def remove(self, entity_id):
+        entity_id = int(entity_id)
+        label = self._label_by_id.pop(entity_id, None)
+        if label is None:
+            return
+        del self._id_by_label[label]
+        for key in self._keys_by_id.pop(entity_id):
+            position = bisect.bisect_left(self._search_keys, (key, entity_id))
+            del self._search_keys[position]
+
+    def clear(self):
+        self.rebuild(())
+
+    def replace_with(self, other):
+        """
+        Переносит в этот индекс содержимое other. Позволяет построить индекс в фоновом
+        потоке и подменить данные в главном без перестроения.
+        """
+        self._label_by_id = other._label_by_id
+        self._id_by_label = other._id_by_label
+        self._keys_by_id = other._keys_by_id
+        self._search_keys = other._search_keys
+
+    def id_for(self, label):
+        """ID по подписи или None."""
+        return self._id_by_label.get(label)
+
+    def label_for(self, entity_id):
+        """Подпись по ID (int или строка) или None."""
+        try:
+            return self._label_by_id.get(int(entity_id))
+        except (TypeError, ValueError):
+            return None
+
+    def search(self, text, limit=50):
+        """
+        До limit подписей, у которых подпись, одно из слов или дополнительный термин
+        начинается с text (без учета регистра), по алфавиту ключа совпадения.
+        """
+        prefix = text.strip().casefold()
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        position = bisect.bisect_left(self._search_keys, (prefix,))
+        while position < len(self._search_keys) and len(results) < limit:
+            key, entity_id = self._search_keys[position]
+            if not key.startswith(prefix):
+                break
+            if entity_id not in seen:
+                seen.add(entity_id)
+                results.append(self._label_by_id[entity_id])
+            position += 1
+        return results
+
+    def __len__(self):
+        return len(self._label_by_id)
+
 def make_text_widget_clipboard_aware(text_widget):
     """
     Обеспечивает стандартные операции буфера обмена для tk.Text виджета.
@@ -0,0 +1,352 @@
+from tkinter import ttk
+from collections import OrderedDict
+
+
+class VirtualTreeview:
+    """
+    Виртуальный (оконный) список на основе ttk.Treeview.
+    В Treeview существуют только строки, видимые на экране; данные подгружаются
+    из БД страницами по page_size строк при прокрутке. Несколько соседних страниц
+    (буфер) запрашиваются заранее и хранятся в небольшом кэше, так что плавная
+    прокрутка не ждет БД. Полоса прокрутки отражает положение во всем наборе данных.
+
+    Источник данных задается двумя функциями, которые выполняются в фоновом потоке
+    через db_worker.DbExecutor:
+        fetch_page(offset, limit, after=None, **query) -> (строки, ключ последней строки или None)
+        count_rows(**query) -> общее число строк
+    Если ключ предыдущей страницы известен, он передается как after, и следующая страница
+    выбирается по ключу (keyset) без OFFSET; offset нужен только при переходе в
+    произвольное место списка.
+    Строку БД в элемент Treeview превращает row_to_item(row) -> (iid, values).
+    iid - первичный ключ строки, поэтому при обновлении данных и прокрутке элементы
+    Treeview не пересоздаются: удаляются, добавляются и изменяются только строки,
+    которые действительно изменились. Список строится заново только в set_query().
+
+    Если задан data_version (функция, возвращающая версию данных, например версии
+    таблиц БД), первая страница и число строк последних snapshot_size запросов
+    запоминаются: при возврате к такому запросу (например, Backspace в строке поиска)
+    список показывается сразу, без ожидания БД, пока версия данных не изменилась.
+    """
+    PAGE_SIZE = 100
+    BUFFER_PAGES = 1       # сколько страниц подгружать заранее с каждой стороны окна
+    MAX_CACHED_PAGES = 20
+    DEFAULT_ROW_HEIGHT = 20
+    DEFAULT_HEADING_HEIGHT = 25
+    SNAPSHOT_SIZE = 32
+
+    def __init__(self, parent, columns, fetch_page, count_rows, row_to_item, db_executor, key,
+                 page_size=PAGE_SIZE, xscroll=False, data_version=None, snapshot_size=SNAPSHOT_SIZE,
+                 **tree_options):
+        """
+        :param parent: Родительский виджет.
+        :param columns: Столбцы Treeview (как для ttk.Treeview).
+        :param db_executor: db_worker.DbExecutor для фоновой загрузки страниц.
+        :param key: Префикс ключей запросов в db_executor, например "courses".
+        :param data_version: Необязательная функция версии данных для кэша первых страниц запросов.
+        """
+        self.fetch_page = fetch_page
+        self.count_rows = count_rows
+        self.row_to_item = row_to_item
+        self.db_executor = db_executor
+        self.key = key
+        self.page_size = page_size
+
+        self.query = {}
+        self.total = 0
+        self.first = 0
+        self.visible_count = 1
+        self.row_height = self.DEFAULT_ROW_HEIGHT
+        self.heading_height = self.DEFAULT_HEADING_HEIGHT
+        self._pages = OrderedDict()
+        self._cursors = {}      # номер страницы -> ключ ее последней строки
+        self._generation = 0
+        self._count_known = False
+        self._rows_by_iid = {}
+        self._values_by_iid = {}
+        self.data_version = data_version
+        self.snapshot_size = snapshot_size
+        self._snapshots = OrderedDict()   # запрос -> (версия данных, число строк, первая страница, ее ключ)
+
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings", **tree_options)
+        self.scrollbar_y = ttk.Scrollbar(self.frame, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar_y.pack(side="right", fill="y")
+        if xscroll:
+            scrollbar_x = ttk.Scrollbar(self.frame, orient="horizontal", command=self.tree.xview)
+            scrollbar_x.pack(side="bottom", fill="x")
+            self.tree.configure(xscrollcommand=scrollbar_x.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self._scroll_units(-3))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_units(3))
+        self.tree.bind("<Up>", lambda e: self._on_arrow(-1))
+        self.tree.bind("<Down>", lambda e: self._on_arrow(1))
+        self.tree.bind("<Prior>", lambda e: self._scroll_units(-self.visible_count))
+        self.tree.bind("<Next>", lambda e: self._scroll_units(self.visible_count))
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def row(self, iid):
+        """Возвращает исходную строку БД для видимого элемента iid (или None)."""
+        return self._rows_by_iid.get(iid)
+
+    def set_query(self, **query):
+        """Задает новые параметры выборки (сортировка, поиск): список перестраивается с начала."""
+        self.query = dict(query)
+        self.first = 0
+        self._reset_data()
+        self.tree.delete(*self.tree.get_children())
+        self._rows_by_iid.clear()
+        self._values_by_iid.clear()
+        if self._restore_snapshot():
+            self._render()
+        self._request_window()
+
+    def refresh(self):
+        """
+        Перечитывает данные после изменений в БД, сохраняя положение прокрутки.
+        Пока новые страницы загружаются, на экране остаются прежние строки.
+        """
+        self._reset_data()
+        self._request_window()
+
+    def replace_row(self, iid, new_row):
+        """Заменяет строку в кэше страниц и на экране (например, после изменения лайков)."""
+        for page in self._pages.values():
+            for i, cached_row in enumerate(page):
+                if self.row_to_item(cached_row)[0] == iid:
+                    page[i] = new_row
+        if self.tree.exists(iid):
+            values = self.row_to_item(new_row)[1]
+            self.tree.item(iid, values=values)
+            self._rows_by_iid[iid] = new_row
+            self._values_by_iid[iid] = values
+
+    def _snapshot_key(self):
+        try:
+            key = tuple(sorted(self.query.items()))
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _save_snapshot(self, version):
+        """Запоминает первую страницу и число строк текущего запроса, прочитанные при версии данных version."""
+        key = self._snapshot_key()
+        if self.data_version is None or key is None or 0 not in self._pages or not self._count_known:
+            return
+        self._snapshots[key] = (version, self.total, list(self._pages[0]), self._cursors.get(0))
+        self._snapshots.move_to_end(key)
+        while len(self._snapshots) > self.snapshot_size:
+            self._snapshots.popitem(last=False)
+
+    def _restore_snapshot(self):
+        """Восстанавливает первую страницу текущего запроса из кэша, если данные с тех пор не менялись."""
+        key = self._snapshot_key()
+        snapshot = self._snapshots.get(key) if key is not None else None
+        if snapshot is None:
+            return False
+        version, total, rows, cursor = snapshot
+        if version != self.data_version():
+            del self._snapshots[key]
+            return False
+        self._snapshots.move_to_end(key)
+        self.total = total
+        self._count_known = True
+        self._pages[0] = list(rows)
+        if cursor is not None:
+            self._cursors[0] = cursor
+        return True
+
+    def _reset_data(self):
+        self._generation += 1
+        self._pages.clear()
+        self._cursors.clear()
+        self._count_known = False
+
+    def _needed_pages(self):
+        """Страницы, покрывающие видимое окно, плюс буфер с обеих сторон."""
+        first_page = self.first // self.page_size
+        last_page = (self.first + self.visible_count - 1) // self.page_size
+        pages = range(max(0, first_page - self.BUFFER_PAGES), last_page + self.BUFFER_PAGES + 1)
+        if self._count_known:
+            max_page = max(0, (self.total - 1) // self.page_size)
+            pages = [p for p in pages if p <= max_page]
+        return list(pages)
+
+    def _request_window(self):
+        """Запрашивает недостающие страницы (и число строк, если оно неизвестно) в фоновом потоке."""
+        missing = [p for p in self._needed_pages() if p not in self._pages]
+        if not missing and self._count_known:
+            return
+        generation = self._generation
+        need_count = not self._count_known
+        query = dict(self.query)
+        page_size = self.page_size
+        cursors = dict(self._cursors)
+
+        def load():
+            # Версия читается до запросов: изменение данных во время загрузки сделает снимок устаревшим.
+            version = self.data_version() if self.data_version else None
+            total = self.count_rows(**query) if need_count else None
+            pages = {}
+            for page_index in missing:
+                pages[page_index], cursors[page_index] = self.fetch_page(
+                    page_index * page_size, page_size, after=cursors.get(page_index - 1), **query
+                )
+            return generation, total, pages, cursors, version
+
+        self.db_executor.submit(load, key=f"{self.key}.window", on_success=self._on_window_loaded)
+
+    def _on_window_loaded(self, result):
+        generation, total, pages, cursors, version = result
+        if generation != self._generation or not self.tree.winfo_exists():
+            return
+        self._cursors.update(cursors)
+        if total is not None:
+            self.total = total
+            self._count_known = True
+        for page_index, rows in pages.items():
+            self._pages[page_index] = list(rows)
+            self._pages.move_to_end(page_index)
+        while len(self._pages) > self.MAX_CACHED_PAGES:
+            self._pages.popitem(last=False)
+        if 0 in pages:
+            self._save_snapshot(version)
+        self._clamp_first()
+        self._render()
+
+        self._request_window()
+
+    def _window_rows(self):
+        """Строки для видимого окна; None, если какая-то из страниц еще не загружена."""
+        rows = []
+        last = min(self.first + self.visible_count, self.total)
+        for index in range(self.first, last):
+            page = self._pages.get(index // self.page_size)
+            if page is None:
+                return None
+            offset = index % self.page_size
+            if offset >= len(page):
+                break
+            rows.append(page[offset])
+        return rows
+
+    def _render(self):
+        """
+        Материализует в Treeview только строки видимого окна. Изменения применяются
+        по разнице с текущими элементами (по iid): ушедшие строки удаляются, новые
+        вставляются на свое место, у оставшихся меняются только изменившиеся значения.
+        Выделение и фокус у оставшихся строк сохраняются сами собой.
+        """
+        rows = self._window_rows()
+        if rows is None:
+            self._update_scrollbar()
+            return
+        items = [self.row_to_item(row) for row in rows]
+        new_iids = {iid for iid, _ in items}
+        stale = [iid for iid in self.tree.get_children() if iid not in new_iids]
+        if stale:
+            self.tree.delete(*stale)
+            for iid in stale:
+                self._rows_by_iid.pop(iid, None)
+                self._values_by_iid.pop(iid, None)
+
+        for index, (row, (iid, values)) in enumerate(zip(rows, items)):
+            if iid in self._values_by_iid:
+                if self._values_by_iid[iid] != values:
+                    self.tree.item(iid, values=values)
+                if self.tree.index(iid) != index:
+                    self.tree.move(iid, "", index)
+            else:
+                self.tree.insert("", index, iid=iid, values=values)
+            self._rows_by_iid[iid] = row
+            self._values_by_iid[iid] = values
+        self.tree.yview_moveto(0)
+        self._update_scrollbar()
+        self._calibrate_row_height()
+
+    def _update_scrollbar(self):
+        if self.total <= 0:
+            self.scrollbar_y.set(0.0, 1.0)
+            return
+        start = self.first / self.total
+        end = min(1.0, (self.first + self.visible_count) / self.total)
+        self.scrollbar_y.set(start, end)
+
+    def _calibrate_row_height(self):
+        """Уточняет высоту строки и заголовка по первому видимому элементу."""
+        children = self.tree.get_children()
+        if not children:
+            return
+        bbox = self.tree.bbox(children[0])
+        if bbox and bbox[3] > 0 and (bbox[3] != self.row_height or bbox[1] != self.heading_height):
+            self.row_height = bbox[3]
+            self.heading_height = bbox[1]
+            self._recompute_visible_count(self.tree.winfo_height())
+
+    def _recompute_visible_count(self, height):
+        visible = max(1, (height - self.heading_height) // self.row_height)
+        if visible != self.visible_count:
+            self.visible_count = visible
+            self._clamp_first()
+            self._render()
+            self._request_window()
+
+    def _clamp_first(self):
+        max_first = max(0, self.total - self.visible_count)
+        self.first = max(0, min(self.first, max_first))
+
+    def scroll_to(self, index):
+        """Прокручивает список так, чтобы строка index оказалась первой видимой."""
+        old_first = self.first
+        self.first = index
+        self._clamp_first()
+        if self.first != old_first:
+            self._render()
+            self._request_window()
+
+    def _scroll_units(self, units):
+        self.scroll_to(self.first + units)
+        return "break"
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * self.total))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.visible_count
+            self.scroll_to(self.first + amount)
+
+    def _on_mousewheel(self, event):
+        step = -1 if event.delta > 0 else 1
+        if abs(event.delta) >= 120:
+            step *= abs(event.delta) // 120
+        return self._scroll_units(step * 3)
+
+    def _on_arrow(self, direction):
+        """Стрелки вверх/вниз: на краю окна прокручивает список на одну строку."""
+        children = self.tree.get_children()
+        focus = self.tree.focus()
+        if not children or focus not in children:
+            return None
+        at_edge = (direction < 0 and focus == children[0]) or (direction > 0 and focus == children[-1])
+        if not at_edge:
+            return None
+        self.scroll_to(self.first + direction)
+        children = self.tree.get_children()
+        if children:
+            target = children[0] if direction < 0 else children[-1]
+            self.tree.focus(target)
+            self.tree.selection_set(target)
+        return "break"
+
+    def _on_configure(self, event):
+        self._recompute_visible_count(event.height)